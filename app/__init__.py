@@ -8,7 +8,7 @@ This module builds shared parts for other modules.
 
 import json
 from fasthx import Jinja
-from fastapi.templating import Jinja2Templates
+from app.utils.timing import TimedJinja2Templates
 
 
 # --------------------------------------------------------------------------------
@@ -19,6 +19,19 @@ with open("config.json") as config_json:
     config = json.load(config_json)
     users = config["users"]
     db_path = config["db_path"]
+    backend = config.get("backend", "tinydb")
+    # Options are keyed by backend, so switching backends never passes one the other's options
+    backend_options = config.get("backend_options", {}).get(backend, {})
+
+    # Where reminders go when their items fall due: "log" or "webhook" (with a "url" option)
+    reminder_sink = config.get("reminder_sink", "log")
+    reminder_sink_options = config.get("reminder_sink_options", {})
+
+    # Adds a Server-Timing header to every response and keeps per-route timing histograms
+    server_timing = config.get("server_timing", True)
+
+    # Serves counters and latency histograms at /metrics
+    metrics_endpoint = config.get("metrics_endpoint", True)
 
 
 # --------------------------------------------------------------------------------
@@ -27,10 +40,16 @@ with open("config.json") as config_json:
 
 secret_key = config["secret_key"]
 
+# Keys from earlier rotations still verify existing session tokens until they are removed
+previous_secret_keys = config.get("previous_secret_keys", [])
+
+# Sessions expire after this many seconds without a request
+session_ttl = config.get("session_ttl", 7 * 24 * 60 * 60)
+
 
 # --------------------------------------------------------------------------------
 # Templates
 # --------------------------------------------------------------------------------
 
-templates = Jinja2Templates(directory="templates")
+templates = TimedJinja2Templates(directory="templates")
 jinja = Jinja(templates)
@@ -6,21 +6,65 @@ This module is the main module for the FastAPI app.
 # Imports
 # --------------------------------------------------------------------------------
 
+from contextlib import asynccontextmanager
+
+from app import (
+    backend,
+    backend_options,
+    db_path,
+    metrics_endpoint,
+    reminder_sink,
+    reminder_sink_options,
+    server_timing,
+)
 from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
-from app.routers import api, login, reminders, root
+from app.routers import api, login, metrics, reminders, root
+from app.utils.auth import SessionRefreshMiddleware, build_storage
 from app.utils.exceptions import UnauthorizedPageException
+from app.utils.backends import close_backends, open_backend
+from app.utils.events import EventOriginMiddleware, broker
+from app.utils.metrics import InFlightMiddleware
+from app.utils.scheduler import open_sink, scheduler
+from app.utils.timing import ServerTimingMiddleware
+
+# --------------------------------------------------------------------------------
+# Lifespan
+# --------------------------------------------------------------------------------
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Workers serving the same database relay their change events through a file next to it
+    broker.start(relay_path=f"{db_path}.events")
+    sink = open_sink(reminder_sink, **reminder_sink_options)
+    await scheduler.start(open_backend(db_path, backend, **backend_options), build_storage, sink)
+    yield
+    await scheduler.stop()
+    await broker.stop()
+    close_backends()
+
 
 # --------------------------------------------------------------------------------
 # App Creation
 # --------------------------------------------------------------------------------
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(root.router)
 app.include_router(api.router)
 app.include_router(login.router)
 app.include_router(reminders.router)
+app.add_middleware(SessionRefreshMiddleware)
+app.add_middleware(EventOriginMiddleware)
+
+if metrics_endpoint:
+    app.include_router(metrics.router)
+    app.add_middleware(InFlightMiddleware)
+
+# Added last, so it wraps the other middleware and its total covers them
+if server_timing:
+    app.add_middleware(ServerTimingMiddleware)
 
 
 # --------------------------------------------------------------------------------
@@ -6,12 +6,15 @@ This module provides routes for the API.
 # Imports
 # --------------------------------------------------------------------------------
 
-from app.utils.auth import get_username_for_api, get_storage_for_page
+from app.utils.auth import get_storage_for_api
+from app.utils.exceptions import BadRequestException
 
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Query, Request, Response
+from datetime import datetime, timezone
+from pydantic import AwareDatetime, BaseModel
+from typing import Optional
 
-from app.utils.storage import ReminderStorage
+from app.utils.storage import AsyncReminderStorage, ReminderListWithItems
 
 # --------------------------------------------------------------------------------
 # Router
@@ -20,25 +23,41 @@ from app.utils.storage import ReminderStorage
 router = APIRouter(prefix="/api")
 
 
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+LIST_FIELDS = ("id", "owner", "name", "reminders")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
 # --------------------------------------------------------------------------------
 # Models
 # --------------------------------------------------------------------------------
 
 
 class ReminderItem(BaseModel):
+    id: Optional[int] = None
     description: str
-    completed: bool
+    completed: bool = False
+    # ISO 8601 with a timezone offset, or a Unix timestamp; stored as a timestamp
+    due_at: Optional[AwareDatetime] = None
+    # "daily", "weekly", "monthly" or "every N days/weeks/months", starting at `due_at`
+    recurrence: Optional[str] = None
 
 
 class ReminderList(BaseModel):
-    id: int
-    owner: str
-    name: str
-    reminders: list[ReminderItem] | None
+    # Fields left out with the `fields` query parameter are omitted from responses
+    id: Optional[int] = None
+    owner: Optional[str] = None
+    name: Optional[str] = None
+    reminders: Optional[list[ReminderItem]] = None
 
 
 class NewReminderList(BaseModel):
     name: str
+    reminders: list[ReminderItem] = []
 
 
 class UpdatedReminderList(BaseModel):
@@ -46,6 +65,50 @@ class UpdatedReminderList(BaseModel):
     reminders: list[ReminderItem]
 
 
+class ItemDue(BaseModel):
+    due_at: Optional[AwareDatetime] = None
+    recurrence: Optional[str] = None
+
+
+# --------------------------------------------------------------------------------
+# Helpers
+# --------------------------------------------------------------------------------
+
+
+def _parse_fields(fields: Optional[str]) -> tuple[str, ...]:
+    if fields is None:
+        return LIST_FIELDS
+
+    selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = sorted(set(selected) - set(LIST_FIELDS))
+    if unknown or not selected:
+        raise BadRequestException(f"fields must be a comma-separated subset of {', '.join(LIST_FIELDS)}")
+    return selected
+
+
+def _serialize_list(reminder_list: ReminderListWithItems, fields: tuple[str, ...]) -> dict:
+    data = {"id": reminder_list.id, "owner": reminder_list.owner, "name": reminder_list.name}
+    if "reminders" in fields:
+        data["reminders"] = [item.as_dict() for item in reminder_list.items]
+    return {field: data[field] for field in fields}
+
+
+def _timestamp(due_at: Optional[datetime]) -> Optional[float]:
+    return due_at.timestamp() if due_at is not None else None
+
+
+def _serialize_items(reminders: list[ReminderItem]) -> list[dict]:
+    return [
+        {
+            "description": item.description,
+            "completed": item.completed,
+            "due_at": _timestamp(item.due_at),
+            "recurrence": item.recurrence,
+        }
+        for item in reminders
+    ]
+
+
 # --------------------------------------------------------------------------------
 # Routes
 # --------------------------------------------------------------------------------
@@ -55,61 +118,121 @@ class UpdatedReminderList(BaseModel):
     "/reminders",
     summary="Get the user's reminder lists",
     response_model=list[ReminderList],
+    response_model_exclude_unset=True,
 )
 async def get_reminders(
-    username: str = Depends(get_username_for_api),
-    storage: ReminderStorage = Depends(get_storage_for_page),
-) -> list[ReminderList]:
+    request: Request,
+    response: Response,
+    after: int = Query(0, ge=0, description="Only return lists with IDs greater than this one"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=f"Comma-separated subset of {', '.join(LIST_FIELDS)}"),
+    storage: AsyncReminderStorage = Depends(get_storage_for_api),
+) -> list[dict]:
     """
-    Gets the list of all reminder lists owned by the user.
+    Gets the reminder lists owned by the user, ordered by ID, with their reminders embedded.
+    When more lists remain, the `Link` header points at the next page.
     """
-    return storage.get_lists(username)
+    selected = _parse_fields(fields)
+    reminder_lists = await storage.get_lists_with_items(after, limit, with_items="reminders" in selected)
+
+    if len(reminder_lists) == limit:
+        next_url = request.url.include_query_params(after=reminder_lists[-1].id)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
 
+    return [_serialize_list(reminder_list, selected) for reminder_list in reminder_lists]
 
-@router.post("/reminders", summary="Create a new reminder list", response_model=ReminderList)
+
+@router.post(
+    "/reminders",
+    summary="Create a new reminder list",
+    response_model=ReminderList,
+    response_model_exclude_unset=True,
+)
 async def post_reminders(
     reminder_list: NewReminderList,
-    username: str = Depends(get_username_for_api),
-    storage: ReminderStorage = Depends(get_storage_for_page),
-) -> ReminderList:
-    list_id = storage.create_list(reminder_list.name, username, reminder_list.reminders)
-    return storage._get_raw_list(list_id, username)
+    storage: AsyncReminderStorage = Depends(get_storage_for_api),
+) -> dict:
+    list_id = await storage.create_list_with_items(
+        reminder_list.name, _serialize_items(reminder_list.reminders)
+    )
+    return _serialize_list(await storage.get_list_with_items(list_id), LIST_FIELDS)
 
 
 @router.get(
     "/reminders/{list_id}",
     summary="Get a reminder list by ID",
     response_model=ReminderList,
+    response_model_exclude_unset=True,
 )
 async def get_list_id(
     list_id: int,
-    username: str = Depends(get_username_for_api),
-    storage: ReminderStorage = Depends(get_storage_for_page),
-) -> ReminderList:
-    return storage._get_raw_list(list_id, username)
+    fields: Optional[str] = Query(None, description=f"Comma-separated subset of {', '.join(LIST_FIELDS)}"),
+    storage: AsyncReminderStorage = Depends(get_storage_for_api),
+) -> dict:
+    selected = _parse_fields(fields)
+    reminder_list = await storage.get_list_with_items(list_id, with_items="reminders" in selected)
+    return _serialize_list(reminder_list, selected)
 
 
 @router.put(
     "/reminders/{list_id}",
     summary="Fully updates a reminder list",
     response_model=ReminderList,
+    response_model_exclude_unset=True,
 )
 async def put_list_id(
     list_id: int,
     reminder_list: UpdatedReminderList,
-    username: str = Depends(get_username_for_api),
-    storage: ReminderStorage = Depends(get_storage_for_page),
-) -> ReminderList:
-    data = reminder_list.dict()
-    storage.update_list(list_id, data, username)
-    return storage._get_raw_list(list_id, username)
+    storage: AsyncReminderStorage = Depends(get_storage_for_api),
+) -> dict:
+    """
+    Renames the list and replaces all of its reminders in one transaction.
+    """
+    await storage.replace_list(list_id, reminder_list.name, _serialize_items(reminder_list.reminders))
+    return _serialize_list(await storage.get_list_with_items(list_id), LIST_FIELDS)
 
 
 @router.delete("/reminders/{list_id}", summary="Deletes a reminder list", response_model=dict)
 async def delete_list_id(
     list_id: int,
-    username: str = Depends(get_username_for_api),
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_api),
 ) -> dict:
-    storage.delete_list(list_id, username)
+    await storage.delete_list(list_id)
+    await storage.reset_selected_after_delete(list_id)
     return dict()
+
+
+@router.put(
+    "/items/{item_id}/due",
+    summary="Sets or clears when a reminder falls due",
+    response_model=ReminderItem,
+)
+async def put_item_due(
+    item_id: int,
+    due: ItemDue,
+    storage: AsyncReminderStorage = Depends(get_storage_for_api),
+) -> dict:
+    """
+    Schedules a reminder for the item at `due_at`, replacing any earlier one. A null `due_at` cancels it.
+    With a `recurrence`, completing the item moves it on to its next occurrence.
+    """
+    await storage.set_item_due(item_id, _timestamp(due.due_at), due.recurrence)
+    return (await storage.get_item(item_id)).as_dict()
+
+
+@router.get(
+    "/items/{item_id}/occurrences",
+    summary="Get the upcoming occurrences of a reminder",
+    response_model=list[datetime],
+)
+async def get_item_occurrences(
+    item_id: int,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    storage: AsyncReminderStorage = Depends(get_storage_for_api),
+) -> list[datetime]:
+    """
+    Gets the due times of the item's next occurrences, starting with the current one.
+    They are computed from the item's rule on request, so asking for more costs no storage.
+    """
+    occurrences = await storage.get_occurrences(item_id, limit)
+    return [datetime.fromtimestamp(due_at, timezone.utc) for due_at in occurrences]
@@ -7,7 +7,13 @@ This module provides routes for authentication.
 # --------------------------------------------------------------------------------
 
 from app import templates
-from app.utils.auth import AuthCookie, get_login_form_creds, get_auth_cookie
+from app.utils.auth import (
+    AuthCookie,
+    get_auth_cookie,
+    get_login_form_creds,
+    revoke_token,
+    revoke_user_sessions,
+)
 from app.utils.exceptions import UnauthorizedPageException
 
 from fastapi import APIRouter, Depends, Request
@@ -71,6 +77,19 @@ async def post_logout(cookie: Optional[AuthCookie] = Depends(get_auth_cookie)) -
     if not cookie:
         raise UnauthorizedPageException()
 
+    revoke_token(cookie)
+    response = Response(status_code=302)
+    response.set_cookie(key=cookie.name, value=cookie.token, expires=-1)
+    response.headers["HX-Redirect"] = "/login?logged_out=True"
+    return response
+
+
+@router.post("/logout/everywhere", summary="Logs out of the app on every device")
+async def post_logout_everywhere(cookie: Optional[AuthCookie] = Depends(get_auth_cookie)) -> dict:
+    if not cookie:
+        raise UnauthorizedPageException()
+
+    revoke_user_sessions(cookie.username)
     response = Response(status_code=302)
     response.set_cookie(key=cookie.name, value=cookie.token, expires=-1)
     response.headers["HX-Redirect"] = "/login?logged_out=True"
@@ -0,0 +1,32 @@
+"""
+This module provides the route that serves the in-process metrics.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+from app.utils.metrics import CONTENT_TYPE, default_registry
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+# --------------------------------------------------------------------------------
+# Router
+# --------------------------------------------------------------------------------
+
+router = APIRouter()
+
+
+# --------------------------------------------------------------------------------
+# Routes
+# --------------------------------------------------------------------------------
+
+
+@router.get(
+    path="/metrics",
+    summary="Gets the app's metrics in the Prometheus text format",
+    include_in_schema=False,
+)
+async def get_metrics():
+    return Response(default_registry.render(), media_type=CONTENT_TYPE)
@@ -6,13 +6,19 @@ This module provides routes for the reminders pages.
 # Imports
 # --------------------------------------------------------------------------------
 
+import hashlib
+
 from app import templates, jinja
 from app.utils.auth import get_storage_for_page
-from app.utils.storage import ReminderStorage
+from app.utils.cache import render_cache
+from app.utils.events import broker
+from app.utils.exceptions import NotFoundException
+from app.utils.storage import AsyncReminderStorage
 
-from fastapi import APIRouter, Depends, Form, Request
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Form, Header, Query, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
 
 
 # --------------------------------------------------------------------------------
@@ -22,36 +28,85 @@ from pydantic import BaseModel
 router = APIRouter()
 
 
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+# Items of the selected list are rendered this many at a time; the rest load as the user scrolls
+ITEMS_PAGE_SIZE = 100
+
+
 # --------------------------------------------------------------------------------
 # Helpers
 # --------------------------------------------------------------------------------
 
 
-def _build_full_page_context(request: Request, storage: ReminderStorage):
-    # reminder_lists
-    reminder_lists = storage.get_lists()
-    list_count = len(reminder_lists)
-    # selected_list
-    selected_list = storage.get_selected_list()
-    selected_list_count = len(selected_list.items) if selected_list else 0
-    working_count = len([item for item in selected_list.items if not item.completed]) if selected_list else 0
-    done_count = selected_list_count - working_count
+async def _build_full_page_context(request: Request, storage: AsyncReminderStorage):
+    page_data = await storage.get_page_data(ITEMS_PAGE_SIZE)
 
     return {
         "request": request,
         "owner": storage.owner,
-        "reminder_lists": reminder_lists,
-        "selected_list": selected_list,
-        "list_count": list_count,
-        "selected_list_count": selected_list_count,
-        "working_count": working_count,
-        "done_count": done_count,
+        "reminder_lists": page_data.lists,
+        "selected_list": page_data.selected_list,
+        "selected_list_id": page_data.selected_list.id if page_data.selected_list else None,
+        "list_count": len(page_data.lists),
+        "selected_list_count": page_data.working_count + page_data.done_count,
+        "working_count": page_data.working_count,
+        "done_count": page_data.done_count,
     }
 
 
-def _get_reminders_grid(request: Request, storage: ReminderStorage):
-    context = _build_full_page_context(request, storage)
-    return templates.TemplateResponse("partials/reminders/content.html", context)
+async def _render_full_page(
+    request: Request, storage: AsyncReminderStorage, template_name: str, version: str
+) -> HTMLResponse:
+    # The version must be read before the data is loaded: a write that races with
+    # the render can then only leave a stale entry behind, never a wrong one
+    body = render_cache.get(storage.owner, template_name, version)
+    if body is None:
+        context = await _build_full_page_context(request, storage)
+        body = templates.TemplateResponse(template_name, context).body
+        render_cache.put(storage.owner, template_name, version, body)
+
+    headers = {"ETag": _build_etag(storage.owner, version), "Cache-Control": "no-cache", "Vary": "Cookie"}
+    return HTMLResponse(body, headers=headers)
+
+
+def _build_etag(owner: str, version: str) -> str:
+    owner_hash = hashlib.sha256(owner.encode()).hexdigest()[:12]
+    return f'W/"{owner_hash}.{version}"'
+
+
+async def _get_reminders_grid(request: Request, storage: AsyncReminderStorage):
+    version = storage.data_version()
+    return await _render_full_page(request, storage, "partials/reminders/content.html", version)
+
+
+async def _get_items_panel(request: Request, storage: AsyncReminderStorage):
+    # The selected list's counters in the sidebar change along with the panel
+    context = await _build_full_page_context(request, storage)
+    selected_list_id = context["selected_list_id"]
+    reminder_lists = context["reminder_lists"]
+    context["reminder_list"] = next((rems for rems in reminder_lists if rems.id == selected_list_id), None)
+    return templates.TemplateResponse("partials/reminders/items-panel-updated.html", context)
+
+
+async def _get_selected_list_id(storage: AsyncReminderStorage) -> int:
+    list_id = await storage.get_selected_list_id()
+    if list_id is None:
+        raise NotFoundException()
+    return list_id
+
+
+async def _build_item_counts_context(storage: AsyncReminderStorage, list_id: int):
+    reminder_list = await storage.get_list(list_id)
+
+    return {
+        "reminder_list": reminder_list,
+        "selected_list_count": reminder_list.item_count,
+        "working_count": reminder_list.item_count - reminder_list.done_count,
+        "done_count": reminder_list.done_count,
+    }
 
 
 # --------------------------------------------------------------------------------
@@ -60,10 +115,15 @@ def _get_reminders_grid(request: Request, storage: ReminderStorage):
 
 
 class ReminderItem(BaseModel):
+    # Only used to serialize non-HTMX responses; storage rows are converted by attribute
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     list_id: int
     description: str
     completed: bool
+    due_at: Optional[float] = None
+    recurrence: Optional[str] = None
 
 
 class ReminderItemResponse(BaseModel):
@@ -76,9 +136,15 @@ class ReminderItemResponse(BaseModel):
 
 
 @router.get("/reminders", summary="Logs into the app", response_class=HTMLResponse)
-async def get_reminders(request: Request, storage: ReminderStorage = Depends(get_storage_for_page)):
-    context = _build_full_page_context(request, storage)
-    return templates.TemplateResponse("pages/reminders.html", context)
+async def get_reminders(request: Request, storage: AsyncReminderStorage = Depends(get_storage_for_page)):
+    version = storage.data_version()
+    etag = _build_etag(storage.owner, version)
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(
+            status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache", "Vary": "Cookie"}
+        )
+
+    return await _render_full_page(request, storage, "pages/reminders.html", version)
 
 
 # --------------------------------------------------------------------------------
@@ -91,34 +157,36 @@ async def get_reminders(request: Request, storage: ReminderStorage = Depends(get
 async def get_reminders_list_row(
     list_id: int,
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
 ):
-    reminder_list = storage.get_list(list_id)
-    selected_list = storage.get_selected_list()
-    return {"reminder_list": reminder_list, "selected_list": selected_list}
+    reminder_list = await storage.get_list(list_id)
+    selected_list_id = await storage.get_selected_list_id()
+    return {"reminder_list": reminder_list, "selected_list_id": selected_list_id}
 
 
 @router.delete("/reminders/list-row/{list_id}", response_class=HTMLResponse)
 async def delete_reminders_list_row(
     list_id: int,
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
 ):
-    storage.delete_list(list_id)
-    storage.reset_selected_after_delete(list_id)
-    return _get_reminders_grid(request, storage)
+    await storage.delete_list(list_id)
+    await storage.reset_selected_after_delete(list_id)
+    return await _get_reminders_grid(request, storage)
 
 
 @router.patch("/reminders/list-row-name/{list_id}", response_class=HTMLResponse)
+@jinja.hx("partials/reminders/list-row-renamed.html")
 async def patch_reminders_list_row_name(
     list_id: int,
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
     new_name: str = Form(),
 ):
-    storage.update_list_name(list_id, new_name)
-    storage.set_selected_list(list_id)
-    return _get_reminders_grid(request, storage)
+    await storage.update_list_name(list_id, new_name)
+    reminder_list = await storage.get_list(list_id)
+    selected_list_id = await storage.get_selected_list_id()
+    return {"reminder_list": reminder_list, "selected_list_id": selected_list_id}
 
 
 @router.get("/reminders/list-row-edit/{list_id}", response_class=HTMLResponse)
@@ -126,17 +194,17 @@ async def patch_reminders_list_row_name(
 async def get_reminders_list_row_edit(
     list_id: int,
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
 ):
-    reminder_list = storage.get_list(list_id)
-    selected_list = storage.get_selected_list()
-    return {"reminder_list": reminder_list, "selected_list": selected_list}
+    reminder_list = await storage.get_list(list_id)
+    selected_list_id = await storage.get_selected_list_id()
+    return {"reminder_list": reminder_list, "selected_list_id": selected_list_id}
 
 
 @router.get("/reminders/new-list-row", response_class=HTMLResponse)
 @jinja.hx("partials/reminders/new-list-row.html")
 async def get_reminders_new_list_row(
-    request: Request, storage: ReminderStorage = Depends(get_storage_for_page)
+    request: Request, storage: AsyncReminderStorage = Depends(get_storage_for_page)
 ):
     return None
 
@@ -144,18 +212,18 @@ async def get_reminders_new_list_row(
 @router.post("/reminders/new-list-row", response_class=HTMLResponse)
 async def post_reminders_new_list_row(
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
     reminder_list_name: str = Form(),
 ):
-    list_id = storage.create_list(reminder_list_name)
-    storage.set_selected_list(list_id)
-    return _get_reminders_grid(request, storage)
+    list_id = await storage.create_list(reminder_list_name)
+    await storage.set_selected_list(list_id)
+    return await _get_reminders_grid(request, storage)
 
 
 @router.get("/reminders/new-list-row-edit", response_class=HTMLResponse)
 @jinja.hx("partials/reminders/new-list-row-edit.html")
 async def get_reminders_new_list_row_edit(
-    request: Request, storage: ReminderStorage = Depends(get_storage_for_page)
+    request: Request, storage: AsyncReminderStorage = Depends(get_storage_for_page)
 ):
     return None
 
@@ -164,10 +232,16 @@ async def get_reminders_new_list_row_edit(
 async def post_reminders_select(
     list_id: int,
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
 ):
-    storage.set_selected_list(list_id)
-    return _get_reminders_grid(request, storage)
+    previous_list_id = await storage.get_selected_list_id()
+    await storage.set_selected_list(list_id)
+
+    # Re-render the items panel, plus the list rows whose highlight changed
+    context = await _build_full_page_context(request, storage)
+    changed_ids = {previous_list_id, context["selected_list_id"]}
+    context["changed_lists"] = [rems for rems in context["reminder_lists"] if rems.id in changed_ids]
+    return templates.TemplateResponse("partials/reminders/list-selected.html", context)
 
 
 # --------------------------------------------------------------------------------
@@ -175,40 +249,55 @@ async def post_reminders_select(
 # --------------------------------------------------------------------------------
 
 
-@router.get("/reminders/item-row/{item_id}", response_class=HTMLResponse)
+@router.get("/reminders/item-row/{item_id}", response_model=ReminderItemResponse)
 @jinja.hx("partials/reminders/item-row.html")
 async def get_reminders_item_row(
     item_id: int,
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
+):
+    reminder_item = await storage.get_item(item_id)
+    return {"reminder_item": reminder_item}
+
+
+@router.get("/reminders/item-rows/{list_id}", response_class=HTMLResponse)
+@jinja.hx("partials/reminders/item-rows-page.html")
+async def get_reminders_item_rows(
+    list_id: int,
+    request: Request,
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
+    cursor: Optional[str] = None,
 ):
-    reminder_item = storage.get_item(item_id)
-    return ReminderItemResponse(reminder_item=ReminderItem(**reminder_item.dict()))
+    items_page = await storage.get_items_page(list_id, cursor, ITEMS_PAGE_SIZE)
+    return {"items": items_page.items, "list_id": list_id, "next_cursor": items_page.next_cursor}
 
 
 @router.get("/reminders/new-item-row", response_class=HTMLResponse)
 @jinja.hx("partials/reminders/new-item-row.html")
 async def get_reminders_new_item_row(
-    request: Request, storage: ReminderStorage = Depends(get_storage_for_page)
+    request: Request, storage: AsyncReminderStorage = Depends(get_storage_for_page)
 ):
     return None
 
 
 @router.post("/reminders/new-item-row", response_class=HTMLResponse)
+@jinja.hx("partials/reminders/new-item-row-added.html")
 async def post_reminders_new_item_row(
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
     reminder_item_name: str = Form(),
 ):
-    selected_list = storage.get_selected_list()
-    storage.add_item(selected_list.id, reminder_item_name)
-    return _get_reminders_grid(request, storage)
+    list_id = await _get_selected_list_id(storage)
+    item_id = await storage.add_item(list_id, reminder_item_name)
+    reminder_item = await storage.get_item(item_id)
+    counts_context = await _build_item_counts_context(storage, list_id)
+    return {"reminder_item": reminder_item, **counts_context}
 
 
 @router.get("/reminders/new-item-row-edit", response_class=HTMLResponse)
 @jinja.hx("partials/reminders/new-item-row-edit.html")
 async def get_reminders_new_item_row_edit(
-    request: Request, storage: ReminderStorage = Depends(get_storage_for_page)
+    request: Request, storage: AsyncReminderStorage = Depends(get_storage_for_page)
 ):
     return None
 
@@ -217,10 +306,15 @@ async def get_reminders_new_item_row_edit(
 async def delete_reminders_item_row(
     item_id: int,
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
 ):
-    storage.delete_item(item_id)
-    return None
+    reminder_item = await storage.get_item(item_id)
+    await storage.delete_item(item_id)
+
+    # The row itself is swapped out with nothing; only the counts come back
+    context = await _build_item_counts_context(storage, reminder_item.list_id)
+    context.update({"request": request, "oob": True})
+    return templates.TemplateResponse("partials/reminders/item-counts.html", context)
 
 
 @router.patch("/reminders/item-row-description/{item_id}", response_model=ReminderItemResponse)
@@ -228,12 +322,12 @@ async def delete_reminders_item_row(
 async def patch_reminders_item_row_description(
     item_id: int,
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
     new_description: str = Form(),
 ):
-    storage.update_item_description(item_id, new_description)
-    reminder_item = storage.get_item(item_id)
-    return ReminderItemResponse(reminder_item=ReminderItem(**reminder_item.dict()))
+    await storage.update_item_description(item_id, new_description)
+    reminder_item = await storage.get_item(item_id)
+    return {"reminder_item": reminder_item}
 
 
 @router.get("/reminders/item-row-edit/{item_id}", response_model=ReminderItemResponse)
@@ -241,19 +335,125 @@ async def patch_reminders_item_row_description(
 async def get_reminders_item_row_edit(
     item_id: int,
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
 ):
-    reminder_item = storage.get_item(item_id)
-    return ReminderItemResponse(reminder_item=ReminderItem(**reminder_item.dict()))
+    reminder_item = await storage.get_item(item_id)
+    return {"reminder_item": reminder_item}
 
 
-@router.patch("/reminders/item-row-strike/{item_id}", response_model=ReminderItemResponse)
-@jinja.hx("partials/reminders/item-row.html")
+@router.patch("/reminders/item-row-strike/{item_id}", response_class=HTMLResponse)
+@jinja.hx("partials/reminders/item-row-struck.html")
 async def patch_reminders_item_row_strike(
     item_id: int,
     request: Request,
-    storage: ReminderStorage = Depends(get_storage_for_page),
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
+):
+    await storage.strike_item(item_id)
+    reminder_item = await storage.get_item(item_id)
+    counts_context = await _build_item_counts_context(storage, reminder_item.list_id)
+    return {"reminder_item": reminder_item, **counts_context}
+
+
+@router.patch("/reminders/item-row-move/{item_id}", response_class=HTMLResponse)
+async def patch_reminders_item_row_move(
+    item_id: int,
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
+    after_id: Optional[int] = Form(default=None),
+):
+    # The page already moved the row while it was dragged, so there is nothing to swap in
+    await storage.move_item(item_id, after_id)
+    return Response(status_code=204)
+
+
+# --------------------------------------------------------------------------------
+# Routes for bulk item actions
+# --------------------------------------------------------------------------------
+
+
+@router.post("/reminders/new-item-rows", response_class=HTMLResponse)
+async def post_reminders_new_item_rows(
+    request: Request,
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
+    reminder_item_names: str = Form(),
+):
+    list_id = await _get_selected_list_id(storage)
+
+    # One item per non-blank line, so a pasted list becomes one batch
+    descriptions = [line.strip() for line in reminder_item_names.splitlines() if line.strip()]
+    await storage.add_items(list_id, descriptions)
+    return await _get_items_panel(request, storage)
+
+
+@router.patch("/reminders/item-rows-completed", response_class=HTMLResponse)
+async def patch_reminders_item_rows_completed(
+    request: Request,
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
+    completed: bool = Form(),
+):
+    list_id = await _get_selected_list_id(storage)
+    await storage.set_items_completed(list_id, completed)
+    return await _get_items_panel(request, storage)
+
+
+@router.delete("/reminders/item-rows-completed", response_class=HTMLResponse)
+async def delete_reminders_item_rows_completed(
+    request: Request,
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
+):
+    list_id = await _get_selected_list_id(storage)
+    await storage.clear_completed_items(list_id)
+    return await _get_items_panel(request, storage)
+
+
+@router.delete("/reminders/item-rows", response_class=HTMLResponse)
+async def delete_reminders_item_rows(
+    request: Request,
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
+    item_id: list[int] = Query(default=[]),
+):
+    # With nothing to delete, the panel is returned as it is
+    if item_id:
+        await storage.delete_items(item_id)
+    return await _get_items_panel(request, storage)
+
+
+# --------------------------------------------------------------------------------
+# Routes for live updates
+# --------------------------------------------------------------------------------
+
+
+@router.get("/reminders/events", summary="Streams change events for the user's data")
+async def get_reminders_events(
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
+    last_event_id: Optional[str] = Header(default=None),
+):
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    stream = broker.stream(storage.owner, last_event_id)
+    return StreamingResponse(stream, media_type="text/event-stream", headers=headers)
+
+
+@router.get("/reminders/content", response_class=HTMLResponse)
+async def get_reminders_content(
+    request: Request, storage: AsyncReminderStorage = Depends(get_storage_for_page)
+):
+    return await _get_reminders_grid(request, storage)
+
+
+@router.get("/reminders/items-panel", response_class=HTMLResponse)
+async def get_reminders_items_panel(
+    request: Request, storage: AsyncReminderStorage = Depends(get_storage_for_page)
+):
+    return await _get_items_panel(request, storage)
+
+
+@router.get("/reminders/counts/{list_id}", response_class=HTMLResponse)
+async def get_reminders_counts(
+    list_id: int,
+    request: Request,
+    storage: AsyncReminderStorage = Depends(get_storage_for_page),
 ):
-    storage.strike_item(item_id)
-    # reminder_item = storage.get_item(item_id)
-    return _get_reminders_grid(request, storage)
+    # Only the list's sidebar counter, plus the panel counts if the list is the one shown
+    context = await _build_item_counts_context(storage, list_id)
+    selected_list_id = await storage.get_selected_list_id()
+    context.update({"request": request, "oob": True, "selected_list_id": selected_list_id})
+    return templates.TemplateResponse("partials/reminders/counts-updated.html", context)
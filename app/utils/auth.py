@@ -6,16 +6,24 @@ This module provides security and authentication.
 # Imports
 # --------------------------------------------------------------------------------
 
+import hashlib
 import jwt
 import secrets
+import threading
+import time
 from typing import Optional
 
-from app import users, secret_key, db_path
+from app import users, secret_key, previous_secret_keys, session_ttl, db_path, backend, backend_options
+from app.utils.cache import token_cache
 from app.utils.exceptions import UnauthorizedException, UnauthorizedPageException
+from app.utils.metrics import Counter
+from app.utils.timing import timed
 from fastapi import Cookie, Form, Depends
 from fastapi.security import HTTPBasic
-from pydantic import BaseModel
-from app.utils.storage import ReminderStorage
+from pydantic import BaseModel, ConfigDict
+from starlette.datastructures import MutableHeaders
+from starlette.requests import cookie_parser
+from app.utils.storage import AsyncReminderStorage, ReminderStorage
 
 
 # --------------------------------------------------------------------------------
@@ -25,6 +33,9 @@ from app.utils.storage import ReminderStorage
 basic_auth = HTTPBasic(auto_error=False)
 auth_cookie_name = "reminders_session"
 
+# A reissued token's predecessor stays valid this many seconds for requests already in flight
+REFRESH_GRACE = 10
+
 
 # --------------------------------------------------------------------------------
 # Models
@@ -32,9 +43,107 @@ auth_cookie_name = "reminders_session"
 
 
 class AuthCookie(BaseModel):
+    # Verified cookies are cached and shared between requests, so they must not change
+    model_config = ConfigDict(frozen=True)
+
     name: str
     token: str
     username: str
+    token_id: str
+    key_id: str
+    issued_at: int
+    expires_at: int
+
+    def needs_refresh(self, now: float) -> bool:
+        # Sliding expiry: halfway through its lifetime, or once its key is rotated out, a token is reissued
+        return self.expires_at - now < session_ttl / 2 or self.key_id != key_ring.current_id
+
+
+# --------------------------------------------------------------------------------
+# Key Ring
+# --------------------------------------------------------------------------------
+
+
+class KeyRing:
+    """
+    Secret keys for session tokens, identified by a short hash of the key.
+    The newest key signs new tokens, and every key in the ring verifies them.
+    """
+
+    def __init__(self, keys: list[str]) -> None:
+        self._keys: dict[str, str] = {}
+        self.current_id = ""
+        for key in reversed(keys):
+            self.add(key)
+
+    @staticmethod
+    def key_id(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()[:8]
+
+    @property
+    def current_key(self) -> str:
+        return self._keys[self.current_id]
+
+    def get(self, key_id: str) -> Optional[str]:
+        return self._keys.get(key_id)
+
+    def add(self, key: str) -> None:
+        self.current_id = self.key_id(key)
+        self._keys = {self.current_id: key, **self._keys}
+
+    def remove(self, key: str) -> None:
+        key_id = self.key_id(key)
+        if key_id == self.current_id:
+            raise ValueError("the current secret key cannot be removed")
+        self._keys.pop(key_id, None)
+
+
+key_ring = KeyRing([secret_key, *previous_secret_keys])
+
+
+# --------------------------------------------------------------------------------
+# Revocations
+# --------------------------------------------------------------------------------
+
+
+class RevocationIndex:
+    """
+    Token IDs and users whose sessions were revoked, kept in memory for O(1) checks.
+    Revoked token IDs are forgotten once the tokens they belong to have expired anyway.
+    """
+
+    def __init__(self) -> None:
+        # Token ID -> (time the revocation takes effect, expiry of the token)
+        self._token_ids: dict[str, tuple[float, int]] = {}
+        self._users: dict[str, int] = {}
+        self._prune_at = 1024
+        self._lock = threading.Lock()
+
+    def revoke_token(self, token_id: str, expires_at: int, grace: float = 0) -> None:
+        with self._lock:
+            self._token_ids[token_id] = (time.time() + grace, expires_at)
+            if len(self._token_ids) >= self._prune_at:
+                now = time.time()
+                self._token_ids = {
+                    token_id: revocation
+                    for token_id, revocation in self._token_ids.items()
+                    if revocation[1] > now
+                }
+                self._prune_at = max(1024, 2 * len(self._token_ids))
+
+    def revoke_user(self, username: str) -> None:
+        # Tokens issued within the same second as the revocation are revoked too
+        with self._lock:
+            self._users[username] = int(time.time()) + 1
+
+    def is_revoked(self, token_id: str, username: str, issued_at: int) -> bool:
+        revocation = self._token_ids.get(token_id)
+        if revocation is not None and revocation[0] <= time.time():
+            return True
+        return issued_at < self._users.get(username, 0)
+
+
+revocations = RevocationIndex()
 
 
 # --------------------------------------------------------------------------------
@@ -43,17 +152,91 @@ class AuthCookie(BaseModel):
 
 
 def serialize_token(username: str) -> str:
-    return jwt.encode({"username": username}, secret_key, algorithm="HS256")
+    now = int(time.time())
+    claims = {"username": username, "iat": now, "exp": now + session_ttl, "jti": secrets.token_urlsafe(12)}
+    return jwt.encode(claims, key_ring.current_key, algorithm="HS256", headers={"kid": key_ring.current_id})
 
 
-def deserialize_token(token: str) -> str:
+jwt_decodes = Counter("reminders_jwt_decodes_total", "Session tokens decoded, each verifying a signature.")
+token_cache_lookups = Counter(
+    "reminders_token_cache_lookups_total", "Session token cache lookups, by result.", ("result",)
+)
+
+
+def decode_token(token: str) -> Optional[dict]:
+    """
+    Returns the claims of a valid, unexpired and unrevoked token, or None.
+    The key ID from the token header is added to the claims as "kid".
+    """
+    jwt_decodes.inc()
     try:
-        data = jwt.decode(token, secret_key, algorithms=["HS256"])
-        return data["username"]
+        key_id = jwt.get_unverified_header(token).get("kid")
+        key = key_ring.get(key_id)
+        if key is None:
+            return None
+
+        claims = jwt.decode(token, key, algorithms=["HS256"], options={"require": ["exp", "iat", "jti"]})
+        if revocations.is_revoked(claims["jti"], claims["username"], claims["iat"]):
+            return None
+        return {**claims, "kid": key_id}
     except Exception:
         return None
 
 
+def deserialize_token(token: str) -> str:
+    claims = decode_token(token)
+    return claims["username"] if claims else None
+
+
+def _build_auth_cookie(token: str) -> Optional[AuthCookie]:
+    claims = decode_token(token)
+    if not claims or claims["username"] not in users:
+        return None
+
+    return AuthCookie(
+        name=auth_cookie_name,
+        token=token,
+        username=claims["username"],
+        token_id=claims["jti"],
+        key_id=claims["kid"],
+        issued_at=claims["iat"],
+        expires_at=claims["exp"],
+    )
+
+
+# --------------------------------------------------------------------------------
+# Session Management
+# --------------------------------------------------------------------------------
+
+
+def rotate_secret_key(new_secret_key: str) -> None:
+    """
+    Signs new tokens with a new secret. Tokens signed with older keys keep working
+    and are reissued with the new key on their next request.
+    """
+    key_ring.add(new_secret_key)
+
+
+def retire_secret_key(old_secret_key: str) -> None:
+    """
+    Removes a key from the ring, so every token it signed stops working immediately.
+    """
+    key_ring.remove(old_secret_key)
+    token_cache.clear()
+
+
+def revoke_token(cookie: AuthCookie) -> None:
+    revocations.revoke_token(cookie.token_id, cookie.expires_at)
+    token_cache.discard(cookie.token)
+
+
+def revoke_user_sessions(username: str) -> None:
+    """
+    Revokes every token issued to a user so far, without affecting other users.
+    """
+    revocations.revoke_user(username)
+
+
 # --------------------------------------------------------------------------------
 # Authentication Checkers
 # --------------------------------------------------------------------------------
@@ -63,18 +246,31 @@ def get_login_form_creds(username: str = Form(), password: str = Form()) -> Opti
     cookie = None
     if username in users:
         if secrets.compare_digest(password, users[username]):
-            token = serialize_token(username)
-            cookie = AuthCookie(name=auth_cookie_name, username=username, token=token)
+            cookie = _build_auth_cookie(serialize_token(username))
     return cookie
 
 
 def get_auth_cookie(reminders_session: str | None = Cookie(default=None)) -> AuthCookie:
-    cookie = None
-    if reminders_session:
-        username = deserialize_token(reminders_session)
-        if username and username in users:
-            cookie = AuthCookie(name=auth_cookie_name, username=username, token=reminders_session)
-    return cookie
+    if not reminders_session:
+        return None
+
+    with timed("auth"):
+        # Verifying the signature is the expensive part, so verified cookies are reused
+        cookie = token_cache.get(reminders_session)
+        token_cache_lookups.inc("miss" if cookie is None else "hit")
+        if cookie is None:
+            cookie = _build_auth_cookie(reminders_session)
+            if cookie is None:
+                return None
+            token_cache.put(reminders_session, cookie)
+
+        # Cached cookies still honor expiry and revocation, both of which are in-memory checks
+        if cookie.expires_at <= time.time() or revocations.is_revoked(
+            cookie.token_id, cookie.username, cookie.issued_at
+        ):
+            token_cache.discard(reminders_session)
+            return None
+        return cookie
 
 
 def get_username_for_api(
@@ -95,7 +291,72 @@ def get_username_for_page(
     return cookie.username
 
 
+def build_storage(username: str) -> AsyncReminderStorage:
+    return AsyncReminderStorage(
+        ReminderStorage(owner=username, db_path=db_path, backend=backend, **backend_options)
+    )
+
+
+def get_storage_for_api(
+    username: str = Depends(get_username_for_api),
+) -> AsyncReminderStorage:
+    return build_storage(username)
+
+
 def get_storage_for_page(
     username: str = Depends(get_username_for_page),
-) -> ReminderStorage:
-    return ReminderStorage(owner=username, db_path=db_path)
+) -> AsyncReminderStorage:
+    return build_storage(username)
+
+
+# --------------------------------------------------------------------------------
+# Middleware
+# --------------------------------------------------------------------------------
+
+
+class SessionRefreshMiddleware:
+    """
+    Reissues session cookies that are due for a refresh on the way out of any request.
+    Responses that set the session cookie themselves, like login and logout, are left alone.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_refresh(message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                refreshed_token = _refresh_token(scope, headers)
+                if refreshed_token:
+                    cookie = f"{auth_cookie_name}={refreshed_token}; Path=/; SameSite=lax"
+                    headers.append("set-cookie", cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_with_refresh)
+
+
+def _refresh_token(scope, response_headers: MutableHeaders) -> Optional[str]:
+    cookie_header = next((value for name, value in scope["headers"] if name == b"cookie"), None)
+    if cookie_header is None:
+        return None
+
+    token = cookie_parser(cookie_header.decode("latin-1")).get(auth_cookie_name)
+    if not token:
+        return None
+
+    prefix = f"{auth_cookie_name}="
+    if any(value.startswith(prefix) for value in response_headers.getlist("set-cookie")):
+        return None
+
+    cookie = get_auth_cookie(token)
+    if cookie is None or not cookie.needs_refresh(time.time()):
+        return None
+
+    # The replaced token stops working too, so logging out with the new one ends the session
+    revocations.revoke_token(cookie.token_id, cookie.expires_at, grace=REFRESH_GRACE)
+    return serialize_token(cookie.username)
@@ -0,0 +1,109 @@
+"""
+This package provides the storage backends that ReminderStorage is built on.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import atexit
+import inspect
+import threading
+
+from app.utils.backends.base import (
+    DUE_TABLE,
+    INDEXED_FIELDS,
+    ITEMS_TABLE,
+    LISTS_TABLE,
+    SELECTED_TABLE,
+    TABLES,
+    StorageBackend,
+)
+from app.utils.backends.journal_backend import JournalBackend
+from app.utils.backends.sqlite_backend import SQLiteBackend
+from app.utils.backends.tinydb_backend import TinyDBBackend
+from app.utils.metrics import Collected
+
+__all__ = [
+    "BACKENDS",
+    "DUE_TABLE",
+    "INDEXED_FIELDS",
+    "ITEMS_TABLE",
+    "LISTS_TABLE",
+    "SELECTED_TABLE",
+    "TABLES",
+    "JournalBackend",
+    "SQLiteBackend",
+    "StorageBackend",
+    "TinyDBBackend",
+    "close_backends",
+    "open_backend",
+]
+
+
+# --------------------------------------------------------------------------------
+# Backend Registry
+# --------------------------------------------------------------------------------
+
+BACKENDS: dict[str, type[StorageBackend]] = {
+    "tinydb": TinyDBBackend,
+    "sqlite": SQLiteBackend,
+    "journal": JournalBackend,
+}
+
+_open_backends: dict[tuple[str, str], StorageBackend] = {}
+_open_backends_lock = threading.Lock()
+
+
+def open_backend(db_path: str, backend: str = "tinydb", **options) -> StorageBackend:
+    """
+    Returns the process-wide backend for a database, opening it on first use.
+    `options` are passed to the backend class when it is opened.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown storage backend '{backend}', expected one of {sorted(BACKENDS)}")
+
+    accepted = [name for name in inspect.signature(BACKENDS[backend]).parameters if name != "db_path"]
+    unknown = sorted(set(options) - set(accepted))
+    if unknown:
+        raise ValueError(f"the {backend} backend does not take the options {unknown}, only {accepted}")
+
+    with _open_backends_lock:
+        key = (backend, db_path)
+        storage_backend = _open_backends.get(key)
+        if storage_backend is None:
+            storage_backend = BACKENDS[backend](db_path, **options)
+            _open_backends[key] = storage_backend
+    return storage_backend
+
+
+def close_backends() -> None:
+    with _open_backends_lock:
+        for storage_backend in _open_backends.values():
+            storage_backend.close()
+        _open_backends.clear()
+
+
+def _open_backend_list() -> list[tuple[tuple[str, str], StorageBackend]]:
+    with _open_backends_lock:
+        return list(_open_backends.items())
+
+
+Collected(
+    "reminders_db_file_bytes",
+    "Size of the database files on disk, by backend and path.",
+    "gauge",
+    lambda: [(key, storage_backend.file_bytes()) for key, storage_backend in _open_backend_list()],
+    ("backend", "path"),
+)
+Collected(
+    "reminders_db_rewrites_total",
+    "Times the whole database file was written out, by backend and path.",
+    "counter",
+    lambda: [(key, storage_backend.rewrites) for key, storage_backend in _open_backend_list()],
+    ("backend", "path"),
+)
+
+
+# Buffered writes must reach the disk even if the app exits without a lifespan shutdown
+atexit.register(close_backends)
@@ -0,0 +1,173 @@
+"""
+This module defines the interface shared by all storage backends.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import os
+import secrets
+import threading
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Iterator, Mapping, Optional
+
+
+# --------------------------------------------------------------------------------
+# Tables
+# --------------------------------------------------------------------------------
+
+LISTS_TABLE = "reminder_lists"
+ITEMS_TABLE = "reminder_items"
+SELECTED_TABLE = "selected_lists"
+# One row per pending reminder, so the scheduler never has to look through the items
+DUE_TABLE = "reminder_due"
+TABLES = (LISTS_TABLE, ITEMS_TABLE, SELECTED_TABLE, DUE_TABLE)
+
+# The fields each table may be searched by with `find`, `find_ids` and `find_many`
+INDEXED_FIELDS = {
+    LISTS_TABLE: ("owner",),
+    ITEMS_TABLE: ("list_id",),
+    SELECTED_TABLE: ("owner",),
+    DUE_TABLE: ("item_id",),
+}
+
+
+# --------------------------------------------------------------------------------
+# StorageBackend Class
+# --------------------------------------------------------------------------------
+
+
+class StorageBackend(ABC):
+    """
+    Stores the rows of the reminder tables.
+    Rows are plain dicts that carry their document ID under the "id" key.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self._instance_id = secrets.token_hex(4)
+        self._versions: dict[str, int] = {}
+        self._epoch = 0
+        # How many times the whole database file was written out, for /metrics
+        self.rewrites = 0
+
+    # Files
+
+    def data_files(self) -> list[str]:
+        return [self.db_path]
+
+    def file_bytes(self) -> int:
+        return sum(os.path.getsize(path) for path in self.data_files() if os.path.exists(path))
+
+    # Data Versions
+
+    def data_version(self, owner: str) -> str:
+        """
+        Returns a token that changes whenever the owner's data changes.
+        It is unique to this backend instance, so tokens never repeat across restarts.
+        Writes made by other processes change the tokens of every owner.
+        """
+        if self.changed_elsewhere():
+            self.invalidate_versions()
+        return f"{self._instance_id}.{self._epoch}.{self._versions.get(owner, 0)}"
+
+    def bump_version(self, owner: str) -> None:
+        with self.lock:
+            self._versions[owner] = self._versions.get(owner, 0) + 1
+
+    def invalidate_versions(self) -> None:
+        # Not under `lock`, since this runs on the event loop: two racing
+        # increments may count as one, but either way every token changes
+        self._epoch += 1
+
+    def changed_elsewhere(self) -> bool:
+        """
+        Returns True if another process has written to the database since this backend last looked.
+        It is called on the event loop, so it must be cheap and must never wait for a lock.
+        """
+        return False
+
+    # Reads
+
+    @abstractmethod
+    def get(self, table: str, doc_id: int) -> Optional[dict]:
+        """
+        Returns the row with the given ID, or None if there is no such row.
+        """
+
+    @abstractmethod
+    def find_ids(self, table: str, field: str, value) -> list[int]:
+        """
+        Returns the sorted IDs of the rows whose indexed `field` equals `value`.
+        """
+
+    def find(self, table: str, field: str, value) -> list[dict]:
+        """
+        Returns the rows whose indexed `field` equals `value`, ordered by ID.
+        """
+        with self.lock:
+            return [self.get(table, doc_id) for doc_id in self.find_ids(table, field, value)]
+
+    def find_many(self, table: str, field: str, values: list) -> list[dict]:
+        """
+        Returns the rows whose indexed `field` equals any of `values`, ordered by ID.
+        """
+        with self.lock:
+            doc_ids = sorted({doc_id for value in values for doc_id in self.find_ids(table, field, value)})
+            return [self.get(table, doc_id) for doc_id in doc_ids]
+
+    @abstractmethod
+    def scan(self, table: str, after_id: int = 0, limit: int = 500) -> list[dict]:
+        """
+        Returns up to `limit` rows with IDs greater than `after_id`, ordered by ID.
+        Used to stream a whole table in batches.
+        """
+
+    # Writes
+
+    @abstractmethod
+    def insert(self, table: str, doc: Mapping) -> int:
+        """
+        Inserts a row and returns its ID.
+        An "id" key in `doc` is used as the row's ID instead of the next free one.
+        """
+
+    def insert_many(self, table: str, docs: list[Mapping]) -> list[int]:
+        """
+        Inserts several rows as one write and returns their IDs.
+        """
+        with self.transaction():
+            return [self.insert(table, doc) for doc in docs]
+
+    @abstractmethod
+    def update(self, table: str, fields: Mapping, doc_ids: list[int]) -> None:
+        """
+        Sets `fields` on every row in `doc_ids`.
+        """
+
+    @abstractmethod
+    def remove(self, table: str, doc_ids: list[int]) -> None:
+        """
+        Removes every row in `doc_ids`. Missing rows are ignored.
+        """
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Groups several reads and writes so no other thread interleaves with them.
+        Backends with real transactions also commit or roll them back as one unit.
+        """
+        with self.lock:
+            yield
+
+    def flush(self) -> None:
+        """
+        Makes every completed write durable. Only backends that buffer writes need this.
+        """
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,385 @@
+"""
+This module provides the journal storage backend, which appends every change to a log file.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+from app.utils.backends.base import INDEXED_FIELDS, TABLES, StorageBackend
+from app.utils.backends.tinydb_backend import FieldIndex
+
+import json
+import os
+import threading
+
+from bisect import bisect_right
+from contextlib import contextmanager
+from typing import Iterator, Mapping, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+# The snapshot keeps the sequence number of the last transaction it contains in this table
+META_TABLE = "_journal"
+
+COMPACT_BYTES = 4 * 1024 * 1024
+
+
+# --------------------------------------------------------------------------------
+# Tables
+# --------------------------------------------------------------------------------
+
+
+class JournalTable:
+    """
+    The rows of one table, held in memory with secondary indexes on some fields.
+    """
+
+    def __init__(self, *fields: str) -> None:
+        self.rows: dict[int, dict] = {}
+        self.next_id = 1
+        self._indexes = {field: FieldIndex(field) for field in fields}
+
+    def find_ids(self, field: str, value) -> list[int]:
+        return self._indexes[field].lookup(value)
+
+    def scan(self, after_id: int, limit: int) -> list[int]:
+        doc_ids = sorted(self.rows)
+        start = bisect_right(doc_ids, after_id)
+        return doc_ids[start : start + limit]
+
+    def insert(self, doc_id: int, doc: dict) -> None:
+        old_doc = self.rows.get(doc_id)
+        if old_doc is not None:
+            self._unindex(doc_id, old_doc)
+        self.rows[doc_id] = doc
+        self.next_id = max(self.next_id, doc_id + 1)
+        for index in self._indexes.values():
+            index.add(doc_id, doc)
+
+    def update(self, fields: Mapping, doc_ids: list[int]) -> None:
+        reindex = any(field in self._indexes for field in fields)
+        for doc_id in doc_ids:
+            doc = self.rows.get(doc_id)
+            if doc is None:
+                continue
+            if reindex:
+                self._unindex(doc_id, doc)
+            doc.update(fields)
+            if reindex:
+                for index in self._indexes.values():
+                    index.add(doc_id, doc)
+
+    def remove(self, doc_ids: list[int]) -> None:
+        for doc_id in doc_ids:
+            doc = self.rows.pop(doc_id, None)
+            if doc is not None:
+                self._unindex(doc_id, doc)
+
+    def _unindex(self, doc_id: int, doc: Mapping) -> None:
+        for index in self._indexes.values():
+            index.discard(doc_id, doc)
+
+
+# --------------------------------------------------------------------------------
+# JournalBackend Class
+# --------------------------------------------------------------------------------
+
+
+class JournalBackend(StorageBackend):
+    """
+    Keeps the whole database in memory and appends each transaction to "<db_path>.journal"
+    as one JSON line, so a write costs the size of the change rather than of the database.
+
+    The database file itself is a snapshot in TinyDB's format, so an existing TinyDB
+    file can be opened as is. On startup the snapshot is loaded and the journal replayed.
+    A background thread compacts the journal into a new snapshot once it outgrows
+    `compact_bytes`, which bounds the startup time, and closing compacts it too.
+
+    Every transaction is fsynced before it returns, and writers that finish while a
+    sync is running share the next one. With a positive `fsync_interval` (in seconds),
+    a background thread syncs at most once per interval instead: up to `fsync_interval`
+    seconds of writes are lost if the machine crashes, but none if only the process dies.
+
+    Only one process may open a database at a time.
+    """
+
+    def __init__(self, db_path: str, fsync_interval: float = 0, compact_bytes: int = COMPACT_BYTES) -> None:
+        super().__init__(db_path)
+        self.journal_path = f"{db_path}.journal"
+        self.compact_bytes = compact_bytes
+        self._depth = 0
+        self._pending: list[list] = []
+        self._tables = {name: JournalTable(*INDEXED_FIELDS[name]) for name in TABLES}
+        self._seq = 0
+
+        self._lock_fd = os.open(f"{db_path}.lock", os.O_RDWR | os.O_CREAT, 0o666)
+        if fcntl:
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(self._lock_fd)
+                raise RuntimeError(f"'{db_path}' is already open in another process") from None
+
+        self._load()
+        self._journal_fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        self._journal_bytes = os.fstat(self._journal_fd).st_size
+
+        # Byte counts over the life of this backend, across journal files
+        self._written = 0
+        self._synced = 0
+        self._sync_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+
+        self._closed = threading.Event()
+        self._compact_wanted = threading.Event()
+        self._compactor = threading.Thread(
+            target=self._compact_when_wanted, name="journal-compact", daemon=True
+        )
+        self._compactor.start()
+
+        self.fsync_interval = fsync_interval
+        self._syncer: Optional[threading.Thread] = None
+        if fsync_interval > 0:
+            self._syncer = threading.Thread(target=self._sync_periodically, name="journal-sync", daemon=True)
+            self._syncer.start()
+
+    # Loading
+
+    def _load(self) -> None:
+        snapshot_seq = self._load_snapshot()
+        compacting_path = f"{self.journal_path}.compacting"
+        interrupted = os.path.exists(compacting_path)
+
+        if interrupted:
+            self._replay(compacting_path, snapshot_seq)
+        good_bytes = self._replay(self.journal_path, snapshot_seq)
+
+        # A line cut short by a crash was never acknowledged, so it is dropped
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > good_bytes:
+            os.truncate(self.journal_path, good_bytes)
+
+        # Finish a compaction that was interrupted after the journal was set aside
+        if interrupted:
+            self._write_snapshot(self._copy_tables(), self._seq)
+            os.remove(compacting_path)
+
+    def _load_snapshot(self) -> int:
+        if not os.path.exists(self.db_path) or os.path.getsize(self.db_path) == 0:
+            return 0
+
+        with open(self.db_path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        for name, table in self._tables.items():
+            for doc_id, doc in snapshot.get(name, {}).items():
+                table.insert(int(doc_id), doc)
+
+        self._seq = snapshot.get(META_TABLE, {}).get("1", {}).get("seq", 0)
+        return self._seq
+
+    def _replay(self, path: str, after_seq: int) -> int:
+        """
+        Applies the transactions in a journal file that came after `after_seq`.
+        Returns the length of the file up to the first incomplete line.
+        """
+        if not os.path.exists(path):
+            return 0
+
+        good_bytes = 0
+        with open(path, "rb") as journal_file:
+            for line in journal_file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+
+                good_bytes += len(line)
+                if entry["seq"] > after_seq:
+                    for op in entry["ops"]:
+                        self._apply(op)
+                    self._seq = entry["seq"]
+        return good_bytes
+
+    # Applying Changes
+
+    def _apply(self, op: list) -> None:
+        kind, table = op[0], self._tables[op[1]]
+        if kind == "insert":
+            table.insert(op[2], dict(op[3]))
+        elif kind == "update":
+            table.update(op[2], op[3])
+        elif kind == "remove":
+            table.remove(op[2])
+
+    def _record(self, op: list) -> None:
+        # Must hold `lock` inside a transaction; the op is appended to the journal when it ends
+        self._apply(op)
+        self._pending.append(op)
+
+    def _write_pending(self) -> int:
+        """
+        Appends the pending ops as one transaction and returns the write position it ends at.
+        A single write keeps each line whole even if the process dies.
+        """
+        self._seq += 1
+        line = json.dumps({"seq": self._seq, "ops": self._pending}, separators=(",", ":")) + "\n"
+        self._pending = []
+
+        data = line.encode()
+        os.write(self._journal_fd, data)
+        self._written += len(data)
+        self._journal_bytes += len(data)
+        if self._journal_bytes > self.compact_bytes:
+            self._compact_wanted.set()
+        return self._written
+
+    # Syncing
+
+    def _sync(self, position: int) -> None:
+        # Writers that queue up here while a sync is running are covered by the next one
+        with self._sync_lock:
+            if self._synced >= position:
+                return
+            written = self._written
+            os.fsync(self._journal_fd)
+            self._synced = written
+
+    def _sync_periodically(self) -> None:
+        while not self._closed.wait(self.fsync_interval):
+            self._sync(self._written)
+
+    # Compaction
+
+    def _copy_tables(self) -> dict:
+        return {
+            name: {doc_id: dict(doc) for doc_id, doc in table.rows.items()}
+            for name, table in self._tables.items()
+        }
+
+    def data_files(self) -> list[str]:
+        return [self.db_path, self.journal_path]
+
+    def _write_snapshot(self, tables: dict, seq: int) -> None:
+        snapshot = {name: {str(doc_id): doc for doc_id, doc in rows.items()} for name, rows in tables.items()}
+        snapshot[META_TABLE] = {"1": {"seq": seq}}
+
+        temp_path = f"{self.db_path}.tmp"
+        with open(temp_path, "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temp_path, self.db_path)
+        self.rewrites += 1
+
+    def _compact_when_wanted(self) -> None:
+        while True:
+            self._compact_wanted.wait()
+            if self._closed.is_set():
+                return
+            self._compact_wanted.clear()
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Writes a new snapshot and starts an empty journal.
+        Writes wait only while the tables are copied and the journal is switched.
+        """
+        compacting_path = f"{self.journal_path}.compacting"
+        with self._compact_lock:
+            with self._sync_lock, self.lock:
+                if self._journal_bytes == 0:
+                    return
+
+                tables, seq = self._copy_tables(), self._seq
+                os.fsync(self._journal_fd)
+                os.close(self._journal_fd)
+                self._synced = self._written
+                os.replace(self.journal_path, compacting_path)
+                self._journal_fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+                self._journal_bytes = 0
+
+            self._write_snapshot(tables, seq)
+            os.remove(compacting_path)
+
+    # Reads
+
+    def get(self, table: str, doc_id: int) -> Optional[dict]:
+        with self.lock:
+            doc = self._tables[table].rows.get(doc_id)
+            return dict(doc, id=doc_id) if doc is not None else None
+
+    def find_ids(self, table: str, field: str, value) -> list[int]:
+        with self.lock:
+            return self._tables[table].find_ids(field, value)
+
+    def scan(self, table: str, after_id: int = 0, limit: int = 500) -> list[dict]:
+        with self.lock:
+            rows = self._tables[table].rows
+            return [dict(rows[doc_id], id=doc_id) for doc_id in self._tables[table].scan(after_id, limit)]
+
+    # Writes
+
+    def insert(self, table: str, doc: Mapping) -> int:
+        return self.insert_many(table, [doc])[0]
+
+    def insert_many(self, table: str, docs: list[Mapping]) -> list[int]:
+        doc_ids = []
+        with self.transaction():
+            for doc in docs:
+                doc = dict(doc)
+                doc_id = doc.pop("id", None) or self._tables[table].next_id
+                self._record(["insert", table, doc_id, doc])
+                doc_ids.append(doc_id)
+        return doc_ids
+
+    def update(self, table: str, fields: Mapping, doc_ids: list[int]) -> None:
+        if fields and doc_ids:
+            with self.transaction():
+                self._record(["update", table, dict(fields), list(doc_ids)])
+
+    def remove(self, table: str, doc_ids: list[int]) -> None:
+        if doc_ids:
+            with self.transaction():
+                self._record(["remove", table, list(doc_ids)])
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        # Changes apply to memory right away and reach the journal together when the outermost transaction ends
+        position = None
+        with self.lock:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and self._pending:
+                    position = self._write_pending()
+
+        if position is not None and not self._syncer:
+            self._sync(position)
+
+    def flush(self) -> None:
+        self._sync(self._written)
+
+    def close(self) -> None:
+        self._closed.set()
+        self._compact_wanted.set()
+        self._compactor.join()
+        if self._syncer:
+            self._syncer.join()
+
+        # After a clean shutdown the database file alone holds everything
+        self.compact()
+        with self._sync_lock:
+            os.close(self._journal_fd)
+        os.close(self._lock_fd)
@@ -0,0 +1,268 @@
+"""
+This module provides the SQLite storage backend.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import sqlite3
+import threading
+
+from app.utils.backends.base import (
+    DUE_TABLE,
+    INDEXED_FIELDS,
+    ITEMS_TABLE,
+    LISTS_TABLE,
+    SELECTED_TABLE,
+    StorageBackend,
+)
+
+from contextlib import contextmanager
+from typing import Iterator, Mapping, Optional
+
+
+# --------------------------------------------------------------------------------
+# Schema
+# --------------------------------------------------------------------------------
+
+# Every table also has an "id INTEGER PRIMARY KEY" column.
+# Columns missing from an existing database are added when it is opened.
+SCHEMA = {
+    LISTS_TABLE: {
+        "owner": "text",
+        "name": "text",
+        "item_count": "int",
+        "done_count": "int",
+        "last_position": "text",
+    },
+    ITEMS_TABLE: {
+        "list_id": "int",
+        "description": "text",
+        "completed": "bool",
+        "due_at": "real",
+        "recurrence": "text",
+        "recurrence_start": "real",
+        "position": "text",
+    },
+    SELECTED_TABLE: {"owner": "text", "list_id": "int"},
+    DUE_TABLE: {"item_id": "int", "owner": "text", "due_at": "real"},
+}
+
+# Optional columns that rows only carry when they are set, as in TinyDB files
+SPARSE_COLUMNS = {
+    LISTS_TABLE: ("last_position",),
+    ITEMS_TABLE: ("due_at", "recurrence", "recurrence_start", "position"),
+}
+
+SQL_TYPES = {"text": "TEXT", "int": "INTEGER", "bool": "INTEGER", "real": "REAL"}
+
+# SQLite caps the number of bound parameters per statement
+MAX_PARAMS = 500
+
+
+def _encode(kind: str, value):
+    if value is None:
+        return None
+    elif kind == "bool":
+        return int(value)
+    return value
+
+
+def _decode(kind: str, value):
+    if value is None:
+        return None
+    elif kind == "bool":
+        return bool(value)
+    return value
+
+
+def _chunks(values: list) -> Iterator[list]:
+    for start in range(0, len(values), MAX_PARAMS):
+        yield values[start : start + MAX_PARAMS]
+
+
+# --------------------------------------------------------------------------------
+# SQLiteBackend Class
+# --------------------------------------------------------------------------------
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Stores each table as an SQLite table with indexed lookup columns.
+    Runs in WAL mode so writes only touch the pages they change.
+
+    Writes share one connection guarded by `lock`. Reads use one connection per
+    thread, so under WAL they never wait for a write to reach the disk.
+    SQLite's own file locks make it safe for several processes to share a database.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        super().__init__(db_path)
+        self._depth = 0
+        self._writer_thread: Optional[int] = None
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+        self._conn = self._connect()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self.transaction():
+            self._create_schema()
+        self._seen_data_version = self._data_version()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        # Inside a transaction a thread must see its own uncommitted writes
+        if self._depth and self._writer_thread == threading.get_ident():
+            return self._conn
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self.lock:
+                self._readers.append(conn)
+        return conn
+
+    def data_files(self) -> list[str]:
+        # Commits land in the write-ahead log until a checkpoint copies them into the database
+        return [self.db_path, f"{self.db_path}-wal"]
+
+    def _data_version(self) -> int:
+        # Changes whenever a connection other than the writer commits, including ones in other processes
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed_elsewhere(self) -> bool:
+        # Reads always see the latest commit, so only the data versions need to catch up.
+        # While this process is writing, the next call catches up instead of waiting.
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            data_version = self._data_version()
+            changed = data_version != self._seen_data_version
+            self._seen_data_version = data_version
+            return changed
+        finally:
+            self.lock.release()
+
+    def _create_schema(self) -> None:
+        for table, columns in SCHEMA.items():
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY)")
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for column, kind in columns.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {SQL_TYPES[kind]}")
+            for field in INDEXED_FIELDS[table]:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{field} ON {table} ({field})")
+
+    def _select(self, table: str) -> str:
+        return f"SELECT id, {', '.join(SCHEMA[table])} FROM {table}"
+
+    def _to_row(self, table: str, values: tuple) -> dict:
+        row = {"id": values[0]}
+        for (column, kind), value in zip(SCHEMA[table].items(), values[1:]):
+            row[column] = _decode(kind, value)
+        for column in SPARSE_COLUMNS.get(table, ()):
+            if row[column] is None:
+                del row[column]
+        return row
+
+    def _check_field(self, table: str, field: str) -> None:
+        if field not in INDEXED_FIELDS[table]:
+            raise ValueError(f"'{field}' is not an indexed field of '{table}'")
+
+    # Reads
+
+    def get(self, table: str, doc_id: int) -> Optional[dict]:
+        values = self._reader().execute(f"{self._select(table)} WHERE id = ?", (doc_id,)).fetchone()
+        return self._to_row(table, values) if values else None
+
+    def find_ids(self, table: str, field: str, value) -> list[int]:
+        self._check_field(table, field)
+        cursor = self._reader().execute(f"SELECT id FROM {table} WHERE {field} = ? ORDER BY id", (value,))
+        return [values[0] for values in cursor]
+
+    def find(self, table: str, field: str, value) -> list[dict]:
+        self._check_field(table, field)
+        cursor = self._reader().execute(f"{self._select(table)} WHERE {field} = ? ORDER BY id", (value,))
+        return [self._to_row(table, values) for values in cursor]
+
+    def find_many(self, table: str, field: str, values: list) -> list[dict]:
+        self._check_field(table, field)
+        rows = []
+        for chunk in _chunks(values):
+            placeholders = ", ".join("?" for _ in chunk)
+            sql = f"{self._select(table)} WHERE {field} IN ({placeholders})"
+            rows.extend(self._to_row(table, row_values) for row_values in self._reader().execute(sql, chunk))
+        return sorted(rows, key=lambda row: row["id"])
+
+    def scan(self, table: str, after_id: int = 0, limit: int = 500) -> list[dict]:
+        sql = f"{self._select(table)} WHERE id > ? ORDER BY id LIMIT ?"
+        return [self._to_row(table, values) for values in self._reader().execute(sql, (after_id, limit))]
+
+    # Writes
+
+    def _insert_sql(self, table: str, doc: Mapping) -> tuple[str, list]:
+        columns = [column for column in doc if column == "id" or column in SCHEMA[table]]
+        if len(columns) != len(doc):
+            raise ValueError(f"unknown columns for '{table}': {sorted(set(doc) - set(columns))}")
+
+        kinds = {**SCHEMA[table], "id": "int"}
+        values = [_encode(kinds[column], doc[column]) for column in columns]
+        placeholders = ", ".join("?" for _ in columns)
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", values
+
+    def insert(self, table: str, doc: Mapping) -> int:
+        sql, values = self._insert_sql(table, doc)
+        with self.transaction():
+            return self._conn.execute(sql, values).lastrowid
+
+    def update(self, table: str, fields: Mapping, doc_ids: list[int]) -> None:
+        if not fields or not doc_ids:
+            return
+
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        values = [_encode(SCHEMA[table][column], value) for column, value in fields.items()]
+
+        with self.transaction():
+            for chunk in _chunks(doc_ids):
+                placeholders = ", ".join("?" for _ in chunk)
+                sql = f"UPDATE {table} SET {assignments} WHERE id IN ({placeholders})"
+                self._conn.execute(sql, [*values, *chunk])
+
+    def remove(self, table: str, doc_ids: list[int]) -> None:
+        with self.transaction():
+            for chunk in _chunks(doc_ids):
+                placeholders = ", ".join("?" for _ in chunk)
+                self._conn.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", chunk)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self.lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._writer_thread = threading.get_ident()
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._writer_thread = None
+                    self._conn.execute("ROLLBACK")
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._writer_thread = None
+                    self._conn.execute("COMMIT")
+
+    def close(self) -> None:
+        with self.lock:
+            for reader in self._readers:
+                reader.close()
+            self._readers.clear()
+            self._conn.close()
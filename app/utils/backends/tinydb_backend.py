@@ -0,0 +1,362 @@
+"""
+This module provides the TinyDB storage backend, which keeps the database in one JSON file.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+from app.utils.backends.base import INDEXED_FIELDS, TABLES, StorageBackend
+
+import os
+import struct
+import threading
+
+from bisect import bisect_right
+from contextlib import contextmanager
+from tinydb import TinyDB
+from tinydb.middlewares import Middleware
+from tinydb.storages import JSONStorage
+from tinydb.table import Document, Table
+from typing import Iterator, Mapping, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Without file locks (on Windows) only one process may use a database
+    fcntl = None
+
+
+# --------------------------------------------------------------------------------
+# Middlewares
+# --------------------------------------------------------------------------------
+
+
+class WriteBackMiddleware(Middleware):
+    """
+    Keeps the parsed JSON document in memory so reads never touch the file.
+    Writes only update the cache; the owner saves snapshots of it to the wrapped storage.
+    """
+
+    def __init__(self, storage_cls) -> None:
+        super().__init__(storage_cls)
+        self.cache = None
+        self.dirty = False
+
+    def read(self):
+        if self.cache is None:
+            self.cache = self.storage.read()
+        return self.cache
+
+    def write(self, data) -> None:
+        self.cache = data
+        self.dirty = True
+
+    def snapshot(self) -> Optional[dict]:
+        """
+        Copies the cached document if it has unsaved changes.
+        TinyDB updates documents in place, so the copy is what makes saving safe outside the lock.
+        """
+        if not self.dirty:
+            return None
+
+        self.dirty = False
+        return {
+            name: {doc_id: dict(doc) for doc_id, doc in docs.items()} for name, docs in self.cache.items()
+        }
+
+    def save(self, snapshot: dict) -> None:
+        try:
+            self.storage.write(snapshot)
+        except Exception:
+            self.dirty = True
+            raise
+
+
+# --------------------------------------------------------------------------------
+# Indexes
+# --------------------------------------------------------------------------------
+
+
+class FieldIndex:
+    """
+    Maps the values of one document field to the IDs of the documents holding them.
+    """
+
+    def __init__(self, field: str) -> None:
+        self.field = field
+        self._ids: dict = {}
+
+    def add(self, doc_id: int, doc: Mapping) -> None:
+        self._ids.setdefault(doc.get(self.field), set()).add(doc_id)
+
+    def discard(self, doc_id: int, doc: Mapping) -> None:
+        value = doc.get(self.field)
+        ids = self._ids.get(value)
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del self._ids[value]
+
+    def lookup(self, value) -> list[int]:
+        return sorted(self._ids.get(value, ()))
+
+
+class IndexedTable:
+    """
+    Wraps a TinyDB table and keeps secondary indexes on some of its fields.
+    All writes must go through this class so the indexes stay consistent.
+    """
+
+    def __init__(self, table: Table, *fields: str) -> None:
+        self.table = table
+        self._indexes = {field: FieldIndex(field) for field in fields}
+        for doc in table:
+            self._index(doc.doc_id, doc)
+
+    def _index(self, doc_id: int, doc: Mapping) -> None:
+        for index in self._indexes.values():
+            index.add(doc_id, doc)
+
+    def _unindex(self, doc_id: int, doc: Mapping) -> None:
+        for index in self._indexes.values():
+            index.discard(doc_id, doc)
+
+    def get(self, doc_id: int) -> Optional[Document]:
+        return self.table.get(doc_id=doc_id)
+
+    def find_ids(self, field: str, value) -> list[int]:
+        return self._indexes[field].lookup(value)
+
+    def scan(self, after_id: int, limit: int) -> list[Document]:
+        doc_ids = sorted(int(doc_id) for doc_id in self.table._read_table())
+        start = bisect_right(doc_ids, after_id)
+        return [self.table.get(doc_id=doc_id) for doc_id in doc_ids[start : start + limit]]
+
+    def insert(self, doc: Mapping) -> int:
+        return self.insert_many([doc])[0]
+
+    def insert_many(self, docs: list[Mapping]) -> list[int]:
+        documents = []
+        for doc in docs:
+            doc = dict(doc)
+            doc_id = doc.pop("id", None)
+            documents.append(doc if doc_id is None else Document(doc, doc_id))
+
+        doc_ids = self.table.insert_multiple(documents)
+        for doc_id, doc in zip(doc_ids, documents):
+            self._index(doc_id, doc)
+        return doc_ids
+
+    def update(self, fields: Mapping, doc_ids: list[int]) -> None:
+        reindex = any(field in self._indexes for field in fields)
+        old_docs = [self.table.get(doc_id=doc_id) for doc_id in doc_ids] if reindex else []
+        self.table.update(fields, doc_ids=doc_ids)
+
+        for old_doc in old_docs:
+            if old_doc is not None:
+                self._unindex(old_doc.doc_id, old_doc)
+                self._index(old_doc.doc_id, {**old_doc, **fields})
+
+    def remove(self, doc_ids: list[int]) -> None:
+        old_docs = [self.table.get(doc_id=doc_id) for doc_id in doc_ids]
+        doc_ids = [old_doc.doc_id for old_doc in old_docs if old_doc is not None]
+        if not doc_ids:
+            return
+
+        self.table.remove(doc_ids=doc_ids)
+        for old_doc in old_docs:
+            if old_doc is not None:
+                self._unindex(old_doc.doc_id, old_doc)
+
+
+# --------------------------------------------------------------------------------
+# TinyDBBackend Class
+# --------------------------------------------------------------------------------
+
+
+class TinyDBBackend(StorageBackend):
+    """
+    Keeps the whole database in memory and rewrites the JSON file after every write.
+    The file is rewritten outside of `lock`, so reads never wait for disk I/O.
+
+    With a positive `flush_interval` (in seconds), writes return as soon as the
+    cache is updated and a background thread rewrites the file at most once per
+    interval. Up to `flush_interval` seconds of writes are lost if the process dies.
+
+    Several processes may share one file: writes hold an exclusive lock on the
+    "<db_path>.lock" file, which also stores a generation counter that every
+    save increments. Reads compare it with the generation they loaded and
+    reload the file only after another process wrote to it.
+    Write-behind is not coordinated this way, so `flush_interval` needs a single process.
+    """
+
+    def __init__(self, db_path: str, flush_interval: float = 0) -> None:
+        super().__init__(db_path)
+        self._depth = 0
+        self._save_lock = threading.Lock()
+
+        self._lock_fd = os.open(f"{db_path}.lock", os.O_RDWR | os.O_CREAT, 0o666)
+        self._file_mutex = threading.Lock()
+        self._file_holders = 0
+        with self._holding_file():
+            self._open()
+            self._generation = self._read_generation()
+
+        self.flush_interval = flush_interval
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if flush_interval > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_periodically, name="tinydb-flush", daemon=True
+            )
+            self._flusher.start()
+
+    def _open(self) -> None:
+        self._db = TinyDB(self.db_path, storage=WriteBackMiddleware(JSONStorage))
+        self._storage: WriteBackMiddleware = self._db.storage
+        self._tables = {name: IndexedTable(self._db.table(name), *INDEXED_FIELDS[name]) for name in TABLES}
+
+    # Cross-Process Coordination
+
+    @contextmanager
+    def _holding_file(self) -> Iterator[None]:
+        """
+        Holds the exclusive file lock while any thread of this process is inside.
+        Threads of one process share the lock, so their writes still coalesce into one save.
+        """
+        with self._file_mutex:
+            if self._file_holders == 0 and fcntl:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._file_holders += 1
+        try:
+            yield
+        finally:
+            with self._file_mutex:
+                self._file_holders -= 1
+                if self._file_holders == 0 and fcntl:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _read_generation(self) -> int:
+        data = os.pread(self._lock_fd, 8, 0)
+        return struct.unpack(">Q", data)[0] if len(data) == 8 else 0
+
+    def changed_elsewhere(self) -> bool:
+        # Own saves advance `_generation` before the file, so only other processes get here
+        return self._read_generation() > self._generation
+
+    def _reload_if_changed(self) -> None:
+        # Must hold the file lock and `lock`. Unsaved write-behind changes are never thrown away.
+        generation = self._read_generation()
+        if generation > self._generation and not self._storage.dirty:
+            self._db.close()
+            self._open()
+            self._generation = generation
+            self.invalidate_versions()
+
+    def _refresh(self) -> None:
+        if self.changed_elsewhere():
+            with self._holding_file(), self.lock:
+                self._reload_if_changed()
+
+    # Saving
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            self._save()
+
+    def _save(self) -> None:
+        # Writers that queue up here while a save is running get their changes
+        # written by that save's successor, so rewrites coalesce under load
+        with self._holding_file(), self._save_lock:
+            with self.lock:
+                snapshot = self._storage.snapshot()
+            if snapshot is not None:
+                self._storage.save(snapshot)
+                self.rewrites += 1
+                self._generation = max(self._generation, self._read_generation()) + 1
+                os.pwrite(self._lock_fd, struct.pack(">Q", self._generation), 0)
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        nested = True
+        with self._holding_file():
+            try:
+                with self.lock:
+                    nested = self._depth > 0
+                    if not nested:
+                        self._reload_if_changed()
+                    yield
+            finally:
+                if not nested and not self._flusher:
+                    self._save()
+
+    # Reads
+
+    def get(self, table: str, doc_id: int) -> Optional[dict]:
+        self._refresh()
+        with self.lock:
+            doc = self._tables[table].get(doc_id)
+        return dict(doc, id=doc.doc_id) if doc is not None else None
+
+    def find_ids(self, table: str, field: str, value) -> list[int]:
+        self._refresh()
+        with self.lock:
+            return self._tables[table].find_ids(field, value)
+
+    def find(self, table: str, field: str, value) -> list[dict]:
+        return self.find_many(table, field, [value])
+
+    def find_many(self, table: str, field: str, values: list) -> list[dict]:
+        # One refresh per call, so a reload can never split the IDs from the rows they name
+        self._refresh()
+        with self.lock:
+            indexed_table = self._tables[table]
+            doc_ids = sorted({doc_id for value in values for doc_id in indexed_table.find_ids(field, value)})
+            docs = [indexed_table.get(doc_id) for doc_id in doc_ids]
+        return [dict(doc, id=doc.doc_id) for doc in docs]
+
+    def scan(self, table: str, after_id: int = 0, limit: int = 500) -> list[dict]:
+        self._refresh()
+        with self.lock:
+            docs = self._tables[table].scan(after_id, limit)
+        return [dict(doc, id=doc.doc_id) for doc in docs]
+
+    # Writes
+
+    def insert(self, table: str, doc: Mapping) -> int:
+        with self._writing():
+            return self._tables[table].insert(doc)
+
+    def insert_many(self, table: str, docs: list[Mapping]) -> list[int]:
+        with self._writing():
+            return self._tables[table].insert_many(docs)
+
+    def update(self, table: str, fields: Mapping, doc_ids: list[int]) -> None:
+        with self._writing():
+            self._tables[table].update(fields, doc_ids)
+
+    def remove(self, table: str, doc_ids: list[int]) -> None:
+        with self._writing():
+            self._tables[table].remove(doc_ids)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._writing():
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+
+    def flush(self) -> None:
+        self._save()
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._flusher:
+            self._flusher.join()
+        self._save()
+        with self.lock:
+            self._db.close()
+        os.close(self._lock_fd)
@@ -0,0 +1,133 @@
+"""
+This module provides in-process caches for rendered pages and verified session tokens.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+RENDER_CACHE_ENTRIES = 1024
+RENDER_CACHE_BYTES = 32 * 1024 * 1024
+
+TOKEN_CACHE_ENTRIES = 4096
+TOKEN_CACHE_TTL = 300
+
+
+# --------------------------------------------------------------------------------
+# RenderCache Class
+# --------------------------------------------------------------------------------
+
+
+class RenderCache:
+    """
+    LRU cache of rendered templates, keyed by owner and template name.
+    Each entry remembers the data version it was rendered from, so a write
+    invalidates it simply by bumping the owner's version.
+    The cache holds at most `max_entries` entries and `max_bytes` bytes of content.
+    """
+
+    def __init__(self, max_entries: int = RENDER_CACHE_ENTRIES, max_bytes: int = RENDER_CACHE_BYTES) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, owner: str, template_name: str, version: str) -> Optional[bytes]:
+        key = (owner, template_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, owner: str, template_name: str, version: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+
+        key = (owner, template_name)
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.size -= len(old_entry[1])
+
+            self._entries[key] = (version, body)
+            self.size += len(body)
+
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, evicted_body) = self._entries.popitem(last=False)
+                self.size -= len(evicted_body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+render_cache = RenderCache()
+
+
+# --------------------------------------------------------------------------------
+# TokenCache Class
+# --------------------------------------------------------------------------------
+
+
+class TokenCache:
+    """
+    LRU cache of session tokens that have already passed signature verification.
+    Entries expire `ttl` seconds after they are added, so every token is still
+    re-verified periodically. The cache holds at most `max_entries` tokens.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_ENTRIES, ttl: float = TOKEN_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[1]
+
+    def put(self, token: str, value: Any) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+            self._entries[token] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
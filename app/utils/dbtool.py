@@ -0,0 +1,346 @@
+"""
+This module provides a command line tool for moving data between storage backends
+and for repairing the per-list item counters.
+
+Databases are named as "<backend>:<path>", for example "tinydb:reminder_db.json"
+or "sqlite:reminder.db". TinyDB files are streamed directly, so neither side of a
+copy ever holds the whole document in memory.
+
+Usage:
+    python -m app.utils.dbtool copy tinydb:reminder_db.json sqlite:reminder.db
+    python -m app.utils.dbtool copy sqlite:reminder.db tinydb:reminder_export.json
+    python -m app.utils.dbtool verify tinydb:reminder_db.json sqlite:reminder.db
+    python -m app.utils.dbtool recount sqlite:reminder.db
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from app.utils.backends import BACKENDS, ITEMS_TABLE, LISTS_TABLE, TABLES, StorageBackend
+
+from typing import Iterable, Iterator, Optional
+
+
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+DEFAULT_BATCH_SIZE = 500
+READ_CHUNK_SIZE = 64 * 1024
+CHECKSUM_MODULUS = 2**256
+
+
+# --------------------------------------------------------------------------------
+# TinyDB JSON Streaming
+# --------------------------------------------------------------------------------
+
+
+class _JsonStream:
+    """
+    Reads a TinyDB JSON file one row at a time.
+    The file is a two-level object: {"table": {"doc_id": {...row...}}}.
+    """
+
+    def __init__(self, handle) -> None:
+        self._handle = handle
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+
+        chunk = self._handle.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+
+        # Drop what has already been consumed so the buffer stays bounded
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> Optional[str]:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return None
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if char is None or char not in chars:
+            raise ValueError(f"malformed TinyDB file: expected one of {chars!r}, found {char!r}")
+        self._pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            self._pos = end
+            return value
+
+
+def _iter_tinydb_file(path: str) -> Iterator[tuple[str, dict]]:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+
+    with open(path) as handle:
+        stream = _JsonStream(handle)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+
+        while True:
+            table = stream.value()
+            stream.expect(":")
+            stream.expect("{")
+            if stream.peek() != "}":
+                while True:
+                    doc_id = stream.value()
+                    stream.expect(":")
+                    doc = stream.value()
+                    if table in TABLES:
+                        yield table, {**doc, "id": int(doc_id)}
+                    if stream.expect(",}") == "}":
+                        break
+            else:
+                stream.expect("}")
+
+            if stream.expect(",}") == "}":
+                break
+
+
+def _write_tinydb_file(path: str, rows: Iterable[tuple[str, dict]]) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as handle:
+        handle.write("{")
+        current_table = None
+        first_row = True
+        for table, row in rows:
+            if table != current_table:
+                if current_table is not None:
+                    handle.write("}, ")
+                handle.write(f"{json.dumps(table)}: {{")
+                current_table = table
+                first_row = True
+
+            doc = dict(row)
+            doc_id = doc.pop("id")
+            handle.write(f"{'' if first_row else ', '}{json.dumps(str(doc_id))}: {json.dumps(doc)}")
+            first_row = False
+
+        if current_table is not None:
+            handle.write("}")
+        handle.write("}")
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    os.replace(temp_path, path)
+
+
+# --------------------------------------------------------------------------------
+# Databases
+# --------------------------------------------------------------------------------
+
+
+class Database:
+    """
+    One side of a copy: either a TinyDB JSON file or an open storage backend.
+    """
+
+    def __init__(self, spec: str, open_backend: bool = False) -> None:
+        backend, separator, path = spec.partition(":")
+        if not separator or backend not in BACKENDS:
+            raise ValueError(
+                f"expected '<backend>:<path>' with a backend in {sorted(BACKENDS)}, got '{spec}'"
+            )
+
+        self.spec = spec
+        self.path = path
+        self.backend: Optional[StorageBackend] = None
+        if backend != "tinydb" or open_backend:
+            self.backend = BACKENDS[backend](path)
+
+    def is_empty(self) -> bool:
+        if self.backend is None:
+            return next(_iter_tinydb_file(self.path), None) is None
+        return not any(self.backend.scan(table, limit=1) for table in TABLES)
+
+    def iter_rows(self, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[tuple[str, dict]]:
+        if self.backend is None:
+            yield from _iter_tinydb_file(self.path)
+            return
+
+        for table in TABLES:
+            after_id = 0
+            while rows := self.backend.scan(table, after_id, batch_size):
+                for row in rows:
+                    yield table, row
+                after_id = rows[-1]["id"]
+
+    def write_rows(self, rows: Iterable[tuple[str, dict]], batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        if self.backend is None:
+            _write_tinydb_file(self.path, rows)
+            return
+
+        batch_table, batch = None, []
+        for table, row in rows:
+            if batch and (table != batch_table or len(batch) >= batch_size):
+                self.backend.insert_many(batch_table, batch)
+                batch = []
+            batch_table = table
+            batch.append(row)
+        if batch:
+            self.backend.insert_many(batch_table, batch)
+
+    def close(self) -> None:
+        if self.backend is not None:
+            self.backend.close()
+
+
+# --------------------------------------------------------------------------------
+# Checksums
+# --------------------------------------------------------------------------------
+
+
+def _row_digest(row: dict) -> int:
+    # Missing fields and null fields are treated the same way by every backend
+    canonical = {key: value for key, value in row.items() if value is not None}
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":")).encode()
+    return int.from_bytes(hashlib.sha256(encoded).digest(), "big")
+
+
+def checksum(rows: Iterable[tuple[str, dict]]) -> dict[str, tuple[int, str]]:
+    """
+    Returns (row count, checksum) per table.
+    Row digests are summed, so the checksum does not depend on the row order.
+    """
+    counts = {table: 0 for table in TABLES}
+    sums = {table: 0 for table in TABLES}
+    for table, row in rows:
+        counts[table] += 1
+        sums[table] = (sums[table] + _row_digest(row)) % CHECKSUM_MODULUS
+    return {table: (counts[table], f"{sums[table]:064x}") for table in TABLES}
+
+
+# --------------------------------------------------------------------------------
+# Commands
+# --------------------------------------------------------------------------------
+
+
+def copy(source: Database, target: Database, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+    if not target.is_empty():
+        raise ValueError(f"target '{target.spec}' already contains data")
+    target.write_rows(source.iter_rows(batch_size), batch_size)
+
+
+def verify(source: Database, target: Database, batch_size: int = DEFAULT_BATCH_SIZE) -> list[str]:
+    """
+    Compares row counts and checksums and returns a description of each mismatch.
+    """
+    source_sums = checksum(source.iter_rows(batch_size))
+    target_sums = checksum(target.iter_rows(batch_size))
+    mismatches = []
+    for table in TABLES:
+        (source_count, source_sum), (target_count, target_sum) = source_sums[table], target_sums[table]
+        if source_count != target_count:
+            mismatches.append(f"{table}: {source_count} rows in source, {target_count} rows in target")
+        elif source_sum != target_sum:
+            mismatches.append(f"{table}: checksums differ")
+    return mismatches
+
+
+def recount(database: Database, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Recomputes the item counters of every list from its items and returns how many lists were fixed.
+    """
+    backend = database.backend
+    fixed = 0
+    after_id = 0
+    while reminder_lists := backend.scan(LISTS_TABLE, after_id, batch_size):
+        counts = {row["id"]: [0, 0] for row in reminder_lists}
+        for item in backend.find_many(ITEMS_TABLE, "list_id", list(counts)):
+            counts[item["list_id"]][0] += 1
+            counts[item["list_id"]][1] += bool(item["completed"])
+
+        with backend.transaction():
+            for row in reminder_lists:
+                item_count, done_count = counts[row["id"]]
+                fields = {"item_count": item_count, "done_count": done_count}
+                if any(row.get(field) != value for field, value in fields.items()):
+                    backend.update(LISTS_TABLE, fields, [row["id"]])
+                    fixed += 1
+        after_id = reminder_lists[-1]["id"]
+    return fixed
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.utils.dbtool", description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["copy", "verify", "recount"])
+    parser.add_argument("source", help="source database, e.g. tinydb:reminder_db.json")
+    parser.add_argument("target", nargs="?", help="target database, e.g. sqlite:reminder.db")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.command == "recount":
+        if args.target is not None:
+            parser.error("recount takes a single database")
+        try:
+            database = Database(args.source, open_backend=True)
+        except ValueError as error:
+            parser.error(str(error))
+        try:
+            fixed = recount(database, args.batch_size)
+        finally:
+            database.close()
+        print(f"recount: fixed the counters of {fixed} lists in {args.source}")
+        return 0
+
+    if args.target is None:
+        parser.error(f"{args.command} needs a source and a target database")
+
+    try:
+        source, target = Database(args.source), Database(args.target)
+    except ValueError as error:
+        parser.error(str(error))
+
+    try:
+        if args.command == "copy":
+            copy(source, target, args.batch_size)
+        mismatches = verify(source, target, args.batch_size)
+    except ValueError as error:
+        print(f"error: {error}", file=sys.stderr)
+        return 1
+    finally:
+        source.close()
+        target.close()
+
+    for mismatch in mismatches:
+        print(f"mismatch: {mismatch}", file=sys.stderr)
+    if mismatches:
+        return 1
+
+    print(f"{args.command}: {args.source} and {args.target} match")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+This module provides publishing of data change events to live pages.
+
+ReminderStorage publishes an event after every change, from whichever thread made it.
+Each owner with at least one open event stream has one channel: a short history of
+events plus an asyncio.Event that wakes every stream of that owner at once.
+Streams keep only their position in the history, so an idle stream costs one
+waiting coroutine and nothing per event.
+
+Worker processes serving the same database share their events through an
+append-only relay file, which every worker tails for the events of the others.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import asyncio
+import contextvars
+import json
+import os
+import secrets
+import threading
+
+from collections import deque
+from typing import AsyncIterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+EVENT_HISTORY = 256
+KEEPALIVE_INTERVAL = 20
+
+RELAY_POLL_INTERVAL = 0.5
+RELAY_MAX_BYTES = 1024 * 1024
+
+# The page (browser tab) that caused the current request, so it can skip its own events
+event_origin: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("event_origin", default=None)
+
+
+# --------------------------------------------------------------------------------
+# Channels
+# --------------------------------------------------------------------------------
+
+
+class Channel:
+    """
+    The recent events of one owner. Only touched from the event loop thread.
+    """
+
+    def __init__(self, history: int) -> None:
+        self.epoch = secrets.token_hex(4)
+        self.events: deque[tuple[int, str]] = deque(maxlen=history)
+        self.last_seq = 0
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+
+    def append(self, kind: str, data: dict) -> None:
+        self.last_seq += 1
+        payload = json.dumps({"kind": kind, **data})
+        self.events.append((self.last_seq, f"id: {self.epoch}.{self.last_seq}\ndata: {payload}\n\n"))
+        self.wake()
+
+    def wake(self) -> None:
+        # Waiters hold on to the old event, so replacing it wakes each of them exactly once
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def resume_from(self, last_event_id: Optional[str]) -> Optional[int]:
+        """
+        Returns the sequence number a reconnecting stream should continue after,
+        or None if the events it missed are gone.
+        """
+        if not last_event_id:
+            return self.last_seq
+
+        epoch, _, seq = last_event_id.partition(".")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq: int) -> Optional[list[str]]:
+        """
+        Returns the formatted events after `seq`, or None if some of them are gone.
+        """
+        if seq >= self.last_seq:
+            return []
+        if not self.events or self.events[0][0] > seq + 1:
+            return None
+        return [message for event_seq, message in self.events if event_seq > seq]
+
+
+# --------------------------------------------------------------------------------
+# EventRelay Class
+# --------------------------------------------------------------------------------
+
+
+class EventRelay:
+    """
+    Shares events between processes through an append-only file of JSON lines.
+    Each event is appended with a single write, so lines from different processes never interleave.
+    The file is truncated once it outgrows `max_bytes`. The process that truncates it keeps the
+    lines it had not read yet, so only a truncation by another process can make readers miss events.
+    """
+
+    def __init__(self, path: str, max_bytes: int = RELAY_MAX_BYTES) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.source = f"{os.getpid()}.{secrets.token_hex(4)}"
+        self._fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o666)
+        self._offset = os.fstat(self._fd).st_size
+        self._unread = b""
+        self._missed = False
+        self._lock = threading.Lock()
+
+    def write(self, owner: str, kind: str, data: dict) -> None:
+        """
+        Appends an event for the other processes. Safe to call from any thread.
+        """
+        line = json.dumps({"source": self.source, "owner": owner, "kind": kind, "data": data})
+        with self._lock:
+            # Writers of every process hold the file lock, so none appends while another truncates
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                os.write(self._fd, f"{line}\n".encode())
+                size = os.fstat(self._fd).st_size
+                if size > self.max_bytes:
+                    self._unread += self._take(size)
+                    os.ftruncate(self._fd, 0)
+                    self._offset = 0
+            finally:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _take(self, size: int) -> bytes:
+        # Must hold `_lock`. Returns the complete lines between the offset and `size`, and moves past them.
+        if size < self._offset:
+            # Another process truncated the file, maybe before this one read everything in it
+            self._offset = 0
+            self._missed = True
+
+        chunk = os.pread(self._fd, size - self._offset, self._offset)
+        # A line still being appended is read again on the next call
+        chunk = chunk[: chunk.rfind(b"\n") + 1]
+        self._offset += len(chunk)
+        return chunk
+
+    def read(self) -> tuple[list[tuple[str, str, dict]], bool]:
+        """
+        Returns the (owner, kind, data) events other processes appended since the last call,
+        and whether some events may have been missed in between.
+        """
+        with self._lock:
+            chunk = self._unread + self._take(os.fstat(self._fd).st_size)
+            missed = self._missed
+            self._unread, self._missed = b"", False
+
+        events = []
+        for line in chunk.splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError:
+                missed = True
+                continue
+            if event["source"] != self.source:
+                events.append((event["owner"], event["kind"], event["data"]))
+        return events, missed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+# --------------------------------------------------------------------------------
+# EventBroker Class
+# --------------------------------------------------------------------------------
+
+
+class EventBroker:
+    """
+    Routes change events from storage threads to the event streams on the event loop.
+    Events for owners without open streams are dropped without leaving the calling thread.
+    With a relay, events are also passed to and received from other worker processes.
+    """
+
+    def __init__(self, history: int = EVENT_HISTORY, keepalive: float = KEEPALIVE_INTERVAL) -> None:
+        self.history = history
+        self.keepalive = keepalive
+        self._channels: dict[str, Channel] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._relay: Optional[EventRelay] = None
+        self._relay_reader: Optional[asyncio.Task] = None
+
+    def start(self, relay_path: Optional[str] = None) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._ticker = self._loop.create_task(self._tick())
+        if relay_path:
+            self._relay = EventRelay(relay_path)
+            self._relay_reader = self._loop.create_task(self._read_relay())
+
+    async def stop(self) -> None:
+        for task in (self._ticker, self._relay_reader):
+            if task is not None:
+                task.cancel()
+        if self._relay is not None:
+            self._relay.close()
+        self._loop = None
+        self._ticker = None
+        self._relay = None
+        self._relay_reader = None
+
+    async def _tick(self) -> None:
+        # One timer for every stream: waking them lets each one send a keepalive
+        while True:
+            await asyncio.sleep(self.keepalive)
+            for channel in list(self._channels.values()):
+                channel.wake()
+
+    async def _read_relay(self) -> None:
+        while True:
+            await asyncio.sleep(RELAY_POLL_INTERVAL)
+            events, missed = self._relay.read()
+            if missed:
+                for channel in list(self._channels.values()):
+                    channel.append("reload", {"origin": None})
+            for owner, kind, data in events:
+                self._append(owner, kind, data)
+
+    def publish(self, owner: str, kind: str, **data) -> None:
+        """
+        Publishes an event to the owner's open streams. Safe to call from any thread.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+
+        data["origin"] = event_origin.get()
+        # Other workers may have streams open for the owner even when this one has none
+        relay = self._relay
+        if relay is not None:
+            try:
+                relay.write(owner, kind, data)
+            except OSError:
+                # The change itself is saved; only other workers' pages miss it until they reload
+                pass
+        if owner in self._channels:
+            loop.call_soon_threadsafe(self._append, owner, kind, data)
+
+    def _append(self, owner: str, kind: str, data: dict) -> None:
+        channel = self._channels.get(owner)
+        if channel is not None:
+            channel.append(kind, data)
+
+    async def stream(self, owner: str, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Yields server-sent event messages for the owner until the client goes away.
+        A "reload" event tells the client that it missed events and must refresh.
+        """
+        channel = self._channels.get(owner)
+        if channel is None:
+            channel = self._channels[owner] = Channel(self.history)
+        channel.subscribers += 1
+
+        try:
+            seq = channel.resume_from(last_event_id)
+            if seq is None:
+                seq = channel.last_seq
+                yield _reload_message()
+
+            while True:
+                # Take the event before reading, so nothing published in between is missed
+                changed = channel.changed
+                messages = channel.since(seq)
+                if messages is None:
+                    yield _reload_message()
+                elif messages:
+                    yield "".join(messages)
+                seq = channel.last_seq
+
+                await changed.wait()
+                if channel.last_seq == seq:
+                    yield ": keepalive\n\n"
+        finally:
+            channel.subscribers -= 1
+            if channel.subscribers == 0 and self._channels.get(owner) is channel:
+                del self._channels[owner]
+
+
+def _reload_message() -> str:
+    return f"data: {json.dumps({'kind': 'reload', 'origin': None})}\n\n"
+
+
+broker = EventBroker()
+
+
+# --------------------------------------------------------------------------------
+# Middleware
+# --------------------------------------------------------------------------------
+
+
+class EventOriginMiddleware:
+    """
+    Exposes the X-Client-Id header of a request as `event_origin` for the storage calls it makes.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http":
+            origin = next((value for name, value in scope["headers"] if name == b"x-client-id"), None)
+            event_origin.set(origin.decode("latin-1") if origin else None)
+        await self.app(scope, receive, send)
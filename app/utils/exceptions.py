@@ -14,6 +14,11 @@ from fastapi import HTTPException, status
 # --------------------------------------------------------------------------------
 
 
+class BadRequestException(HTTPException):
+    def __init__(self, detail: str = "Bad Request"):
+        super().__init__(status.HTTP_400_BAD_REQUEST, detail)
+
+
 class UnauthorizedException(HTTPException):
     def __init__(self):
         super().__init__(status.HTTP_401_UNAUTHORIZED, "Unauthorized")
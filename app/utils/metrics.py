@@ -0,0 +1,250 @@
+"""
+This module provides in-process counters, gauges and histograms, served at /metrics
+in the Prometheus text format.
+
+Each module declares the metrics it updates next to the code that updates them.
+Updating one takes an uncontended lock and a dict lookup, and never awaits, so the
+metrics are safe to update from the event loop and from the storage threads alike.
+Figures that already live elsewhere, like file sizes, are read by collectors when
+the metrics are rendered instead of being kept up to date on every change.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import math
+import threading
+
+from bisect import bisect_left
+from typing import Callable, Iterable, Union
+
+
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+# Upper bounds in seconds of the histogram buckets, fine enough for sub-millisecond stages
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --------------------------------------------------------------------------------
+# Histograms
+# --------------------------------------------------------------------------------
+
+
+class Histogram:
+    """
+    Counts observations into the fixed BUCKETS, plus one bucket for everything slower.
+    """
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative_counts(self) -> list[int]:
+        counts, total = [], 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+    def copy(self) -> "Histogram":
+        copy = Histogram()
+        copy.counts, copy.sum, copy.count = list(self.counts), self.sum, self.count
+        return copy
+
+
+# --------------------------------------------------------------------------------
+# Metric Families
+# --------------------------------------------------------------------------------
+
+Sample = tuple[tuple, Union[float, Histogram]]
+
+
+class Metric:
+    """
+    A named family of values, one per combination of label values.
+    Creating one registers it, so it shows up at /metrics.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), registry=None) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, Union[float, Histogram]] = {}
+        self._lock = threading.Lock()
+        (registry or default_registry).register(self)
+
+    def samples(self) -> list[Sample]:
+        with self._lock:
+            return [
+                (label_values, value.copy() if isinstance(value, Histogram) else value)
+                for label_values, value in self._values.items()
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+
+class LatencyHistogram(Metric):
+    kind = "histogram"
+
+    def observe(self, seconds: float, *label_values: str) -> None:
+        with self._lock:
+            histogram = self._values.get(label_values)
+            if histogram is None:
+                histogram = self._values[label_values] = Histogram()
+            histogram.observe(seconds)
+
+
+class Collected(Metric):
+    """
+    A metric whose samples are read from `collect` each time the metrics are rendered.
+    `collect` returns (label values, value) pairs, where the values of histograms are Histograms.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        collect: Callable[[], Iterable[Sample]],
+        labels: tuple[str, ...] = (),
+        registry=None,
+    ) -> None:
+        self.kind = kind
+        self.collect = collect
+        super().__init__(name, help, labels, registry)
+
+    def samples(self) -> list[Sample]:
+        return list(self.collect())
+
+
+# --------------------------------------------------------------------------------
+# Rendering
+# --------------------------------------------------------------------------------
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _render_metric(metric: Metric) -> list[str]:
+    lines = [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+    for label_values, value in sorted(metric.samples(), key=lambda sample: sample[0]):
+        if metric.kind != "histogram":
+            lines.append(f"{metric.name}{_format_labels(metric.labels, label_values)} {_format_value(value)}")
+            continue
+
+        bucket_labels = (*metric.labels, "le")
+        for bound, count in zip((*BUCKETS, math.inf), value.cumulative_counts()):
+            labels = _format_labels(bucket_labels, (*label_values, _format_value(bound)))
+            lines.append(f"{metric.name}_bucket{labels} {count}")
+        labels = _format_labels(metric.labels, label_values)
+        lines.append(f"{metric.name}_sum{labels} {_format_value(value.sum)}")
+        lines.append(f"{metric.name}_count{labels} {value.count}")
+    return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Metric:
+        return self._metrics[name]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(_render_metric(metric))
+        return "\n".join(lines) + "\n"
+
+
+default_registry = MetricsRegistry()
+
+
+# --------------------------------------------------------------------------------
+# Middleware
+# --------------------------------------------------------------------------------
+
+requests_in_flight = Gauge("reminders_requests_in_flight", "HTTP requests currently being served.")
+
+
+class InFlightMiddleware:
+    """
+    Counts the HTTP requests that are being served, including open event streams.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            requests_in_flight.dec()
@@ -0,0 +1,170 @@
+"""
+This module provides fractional position keys for the manual order of items.
+
+A position is a string, and items are listed in the order of their positions.
+Between any two positions there is always another one, so moving an item only
+rewrites that item's position, never the positions of its neighbours. Keys grow
+by about one character for every five moves into the same gap, so lists that see
+many such moves are rebalanced to short, evenly spaced keys now and then.
+
+Keys follow the fractional-indexing scheme of David Greenspan: an integer part,
+whose first character encodes its length, followed by a base-62 fraction.
+Plain string comparison orders them, in Python as in SQL.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+from typing import Optional
+
+
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+INTEGER_ZERO = "a0"
+SMALLEST_INTEGER = "A" + "0" * 26
+
+
+# --------------------------------------------------------------------------------
+# Integer Parts
+# --------------------------------------------------------------------------------
+
+
+def _integer_length(head: str) -> int:
+    # "a" starts a 2-character integer part, "b" a 3-character one, and "Z", "Y", ... the negative ones
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"invalid position head '{head}'")
+
+
+def _split(key: str) -> tuple[str, str]:
+    length = _integer_length(key[0])
+    if length > len(key) or key == SMALLEST_INTEGER or (len(key) > length and key.endswith("0")):
+        raise ValueError(f"invalid position '{key}'")
+    return key[:length], key[length:]
+
+
+def _increment_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for index in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[index]) + 1
+        if digit < len(DIGITS):
+            digits[index] = DIGITS[digit]
+            return head + "".join(digits)
+        digits[index] = "0"
+
+    # Every digit carried over, so the integer part gets a longer head
+    if head == "Z":
+        return INTEGER_ZERO
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append("0")
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for index in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[index]) - 1
+        if digit >= 0:
+            digits[index] = DIGITS[digit]
+            return head + "".join(digits)
+        digits[index] = DIGITS[-1]
+
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+# --------------------------------------------------------------------------------
+# Fractions
+# --------------------------------------------------------------------------------
+
+
+def _midpoint(low: str, high: Optional[str]) -> str:
+    """
+    Returns a fraction between `low` and `high`, where None stands for 1 and "" for 0.
+    """
+    if high is not None:
+        # Keep the shared prefix and split the first digits that differ
+        shared = 0
+        while (low[shared] if shared < len(low) else "0") == high[shared]:
+            shared += 1
+        if shared:
+            return high[:shared] + _midpoint(low[shared:], high[shared:])
+
+    low_digit = DIGITS.index(low[0]) if low else 0
+    high_digit = DIGITS.index(high[0]) if high is not None else len(DIGITS)
+    if high_digit - low_digit > 1:
+        return DIGITS[(low_digit + high_digit) // 2]
+    if high is not None and len(high) > 1:
+        return high[0]
+    return DIGITS[low_digit] + _midpoint(low[1:], None)
+
+
+# --------------------------------------------------------------------------------
+# Keys
+# --------------------------------------------------------------------------------
+
+
+def key_between(before: Optional[str], after: Optional[str]) -> str:
+    """
+    Returns a key that sorts after `before` and before `after`, where None leaves that side open.
+    Raises ValueError unless `before` sorts before `after`.
+    """
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"position '{before}' does not sort before '{after}'")
+
+    if before is None and after is None:
+        return INTEGER_ZERO
+
+    if before is None:
+        integer, fraction = _split(after)
+        if integer == SMALLEST_INTEGER:
+            return integer + _midpoint("", fraction)
+        if integer < after:
+            return integer
+        smaller = _decrement_integer(integer)
+        if smaller is None:
+            raise ValueError("no position sorts before the smallest one")
+        return smaller
+
+    integer, fraction = _split(before)
+    if after is None:
+        larger = _increment_integer(integer)
+        return integer + _midpoint(fraction, None) if larger is None else larger
+
+    after_integer, after_fraction = _split(after)
+    if integer == after_integer:
+        return integer + _midpoint(fraction, after_fraction)
+    larger = _increment_integer(integer)
+    if larger is None:
+        raise ValueError("no position sorts after the largest one")
+    return larger if larger < after else integer + _midpoint(fraction, None)
+
+
+def keys_after(before: Optional[str], count: int) -> list[str]:
+    """
+    Returns `count` ascending keys after `before`, each one step of the integer part apart.
+    """
+    keys = []
+    for _ in range(count):
+        before = key_between(before, None)
+        keys.append(before)
+    return keys
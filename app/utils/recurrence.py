@@ -0,0 +1,118 @@
+"""
+This module provides recurrence rules for reminders.
+
+A recurring item is one row with a rule and the due time of its first occurrence.
+Occurrences are computed from those two on demand and are never stored, so an item
+that recurs daily for years is still a single row.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import re
+
+from calendar import monthrange
+from datetime import datetime, timedelta
+from itertools import count
+from typing import Iterator, Optional
+
+
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+UNITS = {
+    "day": "days",
+    "days": "days",
+    "week": "weeks",
+    "weeks": "weeks",
+    "month": "months",
+    "months": "months",
+}
+SHORTHANDS = {"daily": "days", "weekly": "weeks", "monthly": "months"}
+RULE_PATTERN = re.compile(r"every\s+(\d+)\s+(\w+)")
+
+# The average length of a step of each unit, used to jump close to a given time
+AVERAGE_STEP_SECONDS = {"days": 86400, "weeks": 7 * 86400, "months": 30.436875 * 86400}
+
+
+# --------------------------------------------------------------------------------
+# Recurrence Class
+# --------------------------------------------------------------------------------
+
+
+class Recurrence:
+    """
+    A rule like "daily", "weekly", "monthly" or "every 3 days".
+    Occurrences keep the wall-clock time of the first one in the server's timezone.
+    Monthly ones fall on the same day of the month, or on the last day of shorter months.
+    """
+
+    __slots__ = ("unit", "interval")
+
+    def __init__(self, unit: str, interval: int = 1) -> None:
+        if unit not in AVERAGE_STEP_SECONDS:
+            raise ValueError(f"unknown recurrence unit '{unit}'")
+        if interval < 1:
+            raise ValueError("a recurrence interval must be at least 1")
+        self.unit = unit
+        self.interval = interval
+
+    @classmethod
+    def parse(cls, rule: str) -> "Recurrence":
+        text = rule.strip().lower()
+        if text in SHORTHANDS:
+            return cls(SHORTHANDS[text])
+
+        match = RULE_PATTERN.fullmatch(text)
+        if match is None or match.group(2) not in UNITS:
+            raise ValueError(f"'{rule}' is not a rule like 'daily', 'weekly', 'monthly' or 'every 3 days'")
+        return cls(UNITS[match.group(2)], int(match.group(1)))
+
+    def __str__(self) -> str:
+        if self.interval == 1:
+            return {"days": "daily", "weeks": "weekly", "months": "monthly"}[self.unit]
+        return f"every {self.interval} {self.unit}"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Recurrence) and (self.unit, self.interval) == (other.unit, other.interval)
+
+    def __repr__(self) -> str:
+        return f"Recurrence({str(self)!r})"
+
+    # Occurrences
+
+    def occurrence(self, start: float, index: int) -> float:
+        """
+        Returns the due time of occurrence number `index`, counting the one at `start` as 0.
+        """
+        first = datetime.fromtimestamp(start)
+        if self.unit == "months":
+            months = first.month - 1 + index * self.interval
+            year, month = first.year + months // 12, months % 12 + 1
+            day = min(first.day, monthrange(year, month)[1])
+            return first.replace(year=year, month=month, day=day).timestamp()
+
+        days = index * self.interval * (7 if self.unit == "weeks" else 1)
+        return (first + timedelta(days=days)).timestamp()
+
+    def occurrences(self, start: float, after: Optional[float] = None) -> Iterator[float]:
+        """
+        Yields the due times of the occurrences after `after` (all of them by default), forever.
+        The first one is found without stepping through the ones before it.
+        """
+        first_index = 0
+        if after is not None and after > start:
+            # Jump to about the right occurrence, then back up past any that are already after `after`
+            first_index = int((after - start) // (AVERAGE_STEP_SECONDS[self.unit] * self.interval))
+            while first_index > 0 and self.occurrence(start, first_index - 1) > after:
+                first_index -= 1
+
+        for index in count(first_index):
+            due_at = self.occurrence(start, index)
+            if after is None or due_at > after:
+                yield due_at
+
+    def next_after(self, start: float, after: float) -> float:
+        return next(self.occurrences(start, after))
@@ -0,0 +1,299 @@
+"""
+This module provides the scheduler that delivers reminders when their items fall due.
+
+Pending reminders wait in a min-heap ordered by due time, so the scheduler only ever
+looks at the earliest one and sleeps until it is due. Scheduling costs O(log n).
+Cancelling marks the entry dead in O(1) and leaves it in the heap until it reaches
+the top, and the heap is rebuilt once most of it is dead. At startup the heap is
+loaded from the due table, which holds only the pending reminders, never the items.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import asyncio
+import contextlib
+import heapq
+import httpx
+import logging
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from app.utils.backends import DUE_TABLE, StorageBackend
+from app.utils.metrics import Collected, Counter
+from typing import Any, Callable, Optional
+
+
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+# Longest sleep between checks, so a change of the wall clock is noticed within a minute
+MAX_SLEEP = 60.0
+
+# Dead entries are only swept out once they outnumber the live ones and there are at least this many
+COMPACT_MIN_DEAD = 1024
+
+# Due rows read per batch when the heap is loaded
+LOAD_BATCH_SIZE = 10_000
+
+logger = logging.getLogger(__name__)
+
+reminders_fired = Counter(
+    "reminders_due_fired_total", "Due reminders handed to the sink, by result.", ("result",)
+)
+
+
+# --------------------------------------------------------------------------------
+# Sinks
+# --------------------------------------------------------------------------------
+
+
+class ReminderSink(ABC):
+    """
+    Receives the reminders that fall due. Deliveries may run concurrently.
+    """
+
+    @abstractmethod
+    async def deliver(self, owner: str, item: Any) -> None:
+        """
+        Delivers the reminder for one ReminderItem of `owner`. Raising counts as a failed delivery.
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class LogSink(ReminderSink):
+    """
+    Writes each reminder to a logger, by default the server's own log.
+    """
+
+    def __init__(self, logger: str = "uvicorn.error") -> None:
+        self.logger = logging.getLogger(logger)
+
+    async def deliver(self, owner: str, item: Any) -> None:
+        self.logger.info("Reminder for %s: %s (item %d)", owner, item.description, item.id)
+
+
+class WebhookSink(ReminderSink):
+    """
+    POSTs each reminder as JSON to a URL. Responses other than 2xx count as failed deliveries.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0) -> None:
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def deliver(self, owner: str, item: Any) -> None:
+        response = await self._client.post(self.url, json={"owner": owner, **item.as_dict()})
+        response.raise_for_status()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+SINKS: dict[str, type[ReminderSink]] = {
+    "log": LogSink,
+    "webhook": WebhookSink,
+}
+
+
+def open_sink(sink: str = "log", **options) -> ReminderSink:
+    if sink not in SINKS:
+        raise ValueError(f"unknown reminder sink '{sink}', expected one of {sorted(SINKS)}")
+    return SINKS[sink](**options)
+
+
+# --------------------------------------------------------------------------------
+# ReminderScheduler Class
+# --------------------------------------------------------------------------------
+
+
+class ReminderScheduler:
+    """
+    Fires reminders for one database, set with `start`.
+    Storage calls `schedule` and `cancel` from any thread once its changes are committed.
+    Calls for other databases are ignored, so storages opened by tools and tests never schedule anything.
+
+    Before delivering, the scheduler claims the reminders through storage, which removes
+    their due rows. Workers that share a database therefore deliver each reminder once,
+    from the worker that scheduled it or, after a restart, from whichever claims it first.
+    """
+
+    def __init__(self) -> None:
+        # Entries are [due_at, item_id, owner, live], and `_entries` holds the live one of each item
+        self._heap: list[list] = []
+        self._entries: dict[int, list] = {}
+        self._dead = 0
+        self._lock = threading.Lock()
+
+        self.backend: Optional[StorageBackend] = None
+        self._storage_for: Optional[Callable[[str], Any]] = None
+        self._sink: Optional[ReminderSink] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Lifecycle
+
+    async def start(
+        self, backend: StorageBackend, storage_for: Callable[[str], Any], sink: ReminderSink
+    ) -> None:
+        """
+        Loads the pending reminders of `backend` and starts firing them.
+        `storage_for(owner)` returns the AsyncReminderStorage that claims an owner's reminders.
+        """
+        self.backend = backend
+        self._storage_for = storage_for
+        self._sink = sink
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+        entries = await self._loop.run_in_executor(None, self._load)
+        with self._lock:
+            for entry in entries:
+                # Reminders scheduled while loading are newer than their due rows
+                self._entries.setdefault(entry[1], entry)
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+            self._dead = 0
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        if self._sink is not None:
+            await self._sink.close()
+
+        with self._lock:
+            self._heap, self._entries, self._dead = [], {}, 0
+        self.backend = None
+        self._storage_for = None
+        self._sink = None
+        self._loop = None
+        self._task = None
+
+    def _load(self) -> list[list]:
+        entries, after_id = [], 0
+        while rows := self.backend.scan(DUE_TABLE, after_id, LOAD_BATCH_SIZE):
+            entries.extend([row["due_at"], row["item_id"], row["owner"], True] for row in rows)
+            after_id = rows[-1]["id"]
+        return entries
+
+    # Scheduling
+
+    def schedule(self, backend: StorageBackend, owner: str, reminders: list[tuple[int, float]]) -> None:
+        """
+        Schedules (item ID, due time) pairs, replacing any earlier schedule of the same items.
+        """
+        if backend is not self.backend or not reminders:
+            return
+
+        with self._lock:
+            head = self._heap[0] if self._heap else None
+            for item_id, due_at in reminders:
+                self._kill(item_id)
+                entry = self._entries[item_id] = [due_at, item_id, owner, True]
+                heapq.heappush(self._heap, entry)
+            earlier = self._heap[0] is not head
+
+        # Only a new earliest reminder shortens the current sleep
+        if earlier:
+            self._wake()
+
+    def cancel(self, backend: StorageBackend, item_ids: list[int]) -> None:
+        if backend is not self.backend:
+            return
+
+        with self._lock:
+            for item_id in item_ids:
+                self._kill(item_id)
+            if self._dead >= COMPACT_MIN_DEAD and self._dead * 2 > len(self._heap):
+                self._heap = [entry for entry in self._heap if entry[3]]
+                heapq.heapify(self._heap)
+                self._dead = 0
+
+    def _kill(self, item_id: int) -> None:
+        # Must hold `_lock`
+        entry = self._entries.pop(item_id, None)
+        if entry is not None:
+            entry[3] = False
+            self._dead += 1
+
+    def _wake(self) -> None:
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def _pop_due(self, now: float) -> tuple[list[list], Optional[float]]:
+        """
+        Removes the entries due by `now` from the heap.
+        Returns them with the due time of the next live entry, if any.
+        """
+        due = []
+        with self._lock:
+            while self._heap and (self._heap[0][0] <= now or not self._heap[0][3]):
+                entry = heapq.heappop(self._heap)
+                if entry[3]:
+                    del self._entries[entry[1]]
+                    due.append(entry)
+                else:
+                    self._dead -= 1
+            return due, self._heap[0][0] if self._heap else None
+
+    # Firing
+
+    async def _run(self) -> None:
+        while True:
+            # Cleared before looking at the heap, so a reminder scheduled meanwhile still wakes it
+            self._wakeup.clear()
+            due, next_due = self._pop_due(time.time())
+            if due:
+                await self._fire(due)
+                continue
+
+            timeout = MAX_SLEEP if next_due is None else min(max(next_due - time.time(), 0), MAX_SLEEP)
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+
+    async def _fire(self, due: list[list]) -> None:
+        by_owner: dict[str, list[int]] = {}
+        for _, item_id, owner, _ in due:
+            by_owner.setdefault(owner, []).append(item_id)
+
+        deliveries = []
+        for owner, item_ids in by_owner.items():
+            try:
+                items = await self._storage_for(owner).claim_due_items(item_ids)
+            except Exception:
+                logger.exception("Could not claim the due reminders of %s", owner)
+                continue
+            deliveries.extend(self._deliver(owner, item) for item in items)
+        await asyncio.gather(*deliveries)
+
+    async def _deliver(self, owner: str, item: Any) -> None:
+        try:
+            await self._sink.deliver(owner, item)
+        except Exception:
+            reminders_fired.inc("failed")
+            logger.exception("Could not deliver the reminder for item %d of %s", item.id, owner)
+        else:
+            reminders_fired.inc("delivered")
+
+
+scheduler = ReminderScheduler()
+
+Collected(
+    "reminders_due_pending",
+    "Reminders waiting to fall due in this process.",
+    "gauge",
+    lambda: [((), len(scheduler))],
+)
@@ -6,12 +6,103 @@ This module handles the persistence layer (the "database") for the app.
 # Imports
 # --------------------------------------------------------------------------------
 
-from app.utils.exceptions import NotFoundException, ForbiddenException
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+import weakref
+
+from itertools import islice
+
+from app.utils.backends import (
+    DUE_TABLE,
+    ITEMS_TABLE,
+    LISTS_TABLE,
+    SELECTED_TABLE,
+    StorageBackend,
+    open_backend,
+)
+from app.utils.events import broker
+from app.utils.exceptions import BadRequestException, NotFoundException, ForbiddenException
+from app.utils.metrics import Counter, LatencyHistogram
+from app.utils.positions import key_between, keys_after
+from app.utils.recurrence import Recurrence
+from app.utils.scheduler import scheduler
+from app.utils.timing import timed
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
 
-from pydantic import BaseModel
-from tinydb import TinyDB, Query
-from tinydb.table import Document
-from typing import Optional
+
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+# Storage calls from async routes run on this pool instead of the event loop
+STORAGE_THREADS = 8
+_executor = ThreadPoolExecutor(max_workers=STORAGE_THREADS, thread_name_prefix="storage")
+
+# Writes wait for their database's lock here, so queued writes never hold pool threads
+_write_locks: "weakref.WeakKeyDictionary[StorageBackend, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+# A move that yields a longer position key rebalances the list's keys in the background
+MAX_POSITION_LENGTH = 16
+
+# Background writes started by AsyncReminderStorage, referenced until they finish
+_background_writes: set[asyncio.Task] = set()
+
+logger = logging.getLogger(__name__)
+
+
+def writes(method: Callable) -> Callable:
+    """
+    Marks a ReminderStorage method as one that modifies the database.
+    The owner's data version is bumped after every successful call.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self: "ReminderStorage", *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._backend.bump_version(self.owner)
+        return result
+
+    wrapper.writes = True
+    return wrapper
+
+
+storage_call_seconds = LatencyHistogram(
+    "reminders_storage_call_seconds", "Time spent in each ReminderStorage method.", ("method",)
+)
+storage_call_errors = Counter(
+    "reminders_storage_call_errors_total", "ReminderStorage calls that raised, by method.", ("method",)
+)
+
+
+def _measured(name: str, method: Callable) -> Callable:
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            storage_call_errors.inc(name)
+            raise
+        finally:
+            storage_call_seconds.observe(time.perf_counter() - start, name)
+
+    return wrapper
+
+
+def measured(cls: type) -> type:
+    """
+    Counts and times every public method of a storage class for /metrics.
+    Methods are timed where they run, so waiting for a storage thread is not included.
+    """
+    for name, attribute in list(vars(cls).items()):
+        if not name.startswith("_") and callable(attribute):
+            setattr(cls, name, _measured(name, attribute))
+    return cls
 
 
 # --------------------------------------------------------------------------------
@@ -19,24 +110,200 @@ from typing import Optional
 # --------------------------------------------------------------------------------
 
 
-class ReminderItem(BaseModel):
-    id: int
-    list_id: int
-    description: str
-    completed: bool
+class Row:
+    """
+    Base class for the rows ReminderStorage returns.
+    Rows are plain __slots__ objects, so loading one costs a single small allocation.
+    Pydantic validation only happens at the API boundary.
+    """
 
+    __slots__ = ()
 
-class ReminderList(BaseModel):
-    id: int
-    owner: str
-    name: str
+    def __eq__(self, other) -> bool:
+        return type(other) is type(self) and all(
+            getattr(self, field) == getattr(other, field) for field in self.__slots__
+        )
 
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class ReminderItem(Row):
+    # `due_at` is a Unix timestamp, or None for items without a reminder.
+    # Recurring items carry their rule, and `due_at` is their next open occurrence.
+    __slots__ = ("id", "list_id", "description", "completed", "due_at", "recurrence")
+
+    def __init__(
+        self,
+        id: int,
+        list_id: int,
+        description: str,
+        completed: bool,
+        due_at: Optional[float] = None,
+        recurrence: Optional[str] = None,
+    ) -> None:
+        self.id = id
+        self.list_id = list_id
+        self.description = description
+        self.completed = completed
+        self.due_at = due_at
+        self.recurrence = recurrence
+
+    @classmethod
+    def from_row(cls, row: dict) -> "ReminderItem":
+        return cls(
+            row["id"],
+            row["list_id"],
+            row["description"],
+            row["completed"],
+            row.get("due_at"),
+            row.get("recurrence"),
+        )
 
-class SelectedList(BaseModel):
-    id: int
-    owner: str
-    name: str
-    items: list[ReminderItem]
+
+class ReminderList(Row):
+    __slots__ = ("id", "owner", "name", "item_count", "done_count")
+
+    def __init__(self, id: int, owner: str, name: str, item_count: int = 0, done_count: int = 0) -> None:
+        self.id = id
+        self.owner = owner
+        self.name = name
+        self.item_count = item_count
+        self.done_count = done_count
+
+    @classmethod
+    def from_row(cls, row: dict) -> "ReminderList":
+        return cls(row["id"], row["owner"], row["name"], row["item_count"], row["done_count"])
+
+
+class SelectedList(Row):
+    __slots__ = ("id", "owner", "name", "items", "next_cursor")
+
+    def __init__(
+        self, id: int, owner: str, name: str, items: list[ReminderItem], next_cursor: Optional[str] = None
+    ) -> None:
+        self.id = id
+        self.owner = owner
+        self.name = name
+        self.items = items
+        self.next_cursor = next_cursor
+
+
+class ItemsPage(Row):
+    __slots__ = ("items", "next_cursor")
+
+    def __init__(self, items: list[ReminderItem], next_cursor: Optional[str]) -> None:
+        self.items = items
+        self.next_cursor = next_cursor
+
+
+class ReminderListWithItems(Row):
+    __slots__ = ("id", "owner", "name", "items")
+
+    def __init__(self, id: int, owner: str, name: str, items: Optional[list[ReminderItem]]) -> None:
+        self.id = id
+        self.owner = owner
+        self.name = name
+        self.items = items
+
+
+class PageData(Row):
+    __slots__ = ("lists", "selected_list", "working_count", "done_count")
+
+    def __init__(
+        self,
+        lists: list[ReminderList],
+        selected_list: Optional[SelectedList],
+        working_count: int,
+        done_count: int,
+    ) -> None:
+        self.lists = lists
+        self.selected_list = selected_list
+        self.working_count = working_count
+        self.done_count = done_count
+
+
+# --------------------------------------------------------------------------------
+# Item Order
+# --------------------------------------------------------------------------------
+
+# Items are listed in (completed, position, id) order: open items first, each group in its manual order.
+# Items from before positions existed have none, and come first, oldest first.
+
+
+def _position_key(item: dict) -> tuple[str, int]:
+    return item.get("position") or "", item["id"]
+
+
+def _item_sort_key(item: dict) -> tuple[bool, str, int]:
+    return item["completed"], item.get("position") or "", item["id"]
+
+
+def _assign_positions(rows: list[dict], after: Optional[str]) -> Optional[str]:
+    # Gives new item rows consecutive positions after `after`, and returns the last one
+    for row, position in zip(rows, keys_after(after, len(rows))):
+        row["position"] = position
+    return rows[-1]["position"] if rows else after
+
+
+def _encode_item_cursor(item: dict) -> str:
+    return f"{int(item['completed'])}.{item.get('position') or ''}.{item['id']}"
+
+
+def _decode_item_cursor(cursor: str) -> tuple[bool, str, int]:
+    try:
+        completed, position, item_id = cursor.split(".")
+        if completed not in ("0", "1"):
+            raise ValueError(completed)
+        return completed == "1", position, int(item_id)
+    except ValueError:
+        raise BadRequestException("malformed item cursor")
+
+
+def _page_items(items: list[dict], cursor: Optional[str], limit: Optional[int]) -> ItemsPage:
+    """
+    Returns the items after `cursor` in list order, with a cursor for the next page if there is one.
+    Models are only built for the returned page.
+    """
+    items = sorted(items, key=_item_sort_key)
+    if cursor is not None:
+        after = _decode_item_cursor(cursor)
+        items = [item for item in items if _item_sort_key(item) > after]
+
+    next_cursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        next_cursor = _encode_item_cursor(items[-1])
+    return ItemsPage([ReminderItem.from_row(item) for item in items], next_cursor)
+
+
+# --------------------------------------------------------------------------------
+# Recurrence
+# --------------------------------------------------------------------------------
+
+
+def _recurrence_fields(due_at: Optional[float], rule: Optional[str]) -> dict:
+    """
+    Returns the recurrence fields of an item row for a rule, which starts at the item's due time.
+    """
+    if not rule:
+        return {"recurrence": None, "recurrence_start": None}
+    if due_at is None:
+        raise BadRequestException("a recurring reminder needs a due time")
+    try:
+        return {"recurrence": str(Recurrence.parse(rule)), "recurrence_start": due_at}
+    except ValueError as error:
+        raise BadRequestException(str(error)) from None
+
+
+def _next_occurrence(item: dict, now: float) -> float:
+    # Completing an occurrence early moves on to the one after it; late, it skips the missed ones
+    rule = Recurrence.parse(item["recurrence"])
+    return rule.next_after(item["recurrence_start"], max(item["due_at"], now))
 
 
 # --------------------------------------------------------------------------------
@@ -44,19 +311,19 @@ class SelectedList(BaseModel):
 # --------------------------------------------------------------------------------
 
 
+@measured
 class ReminderStorage:
-    def __init__(self, owner: str, db_path: str = "reminder_db.json") -> None:
+    def __init__(
+        self, owner: str, db_path: str = "reminder_db.json", backend: str = "tinydb", **backend_options
+    ) -> None:
         self.owner = owner
         self._db_path = db_path
-        self._db = TinyDB(db_path)
-        self._lists_table = self._db.table("reminder_lists")
-        self._items_table = self._db.table("reminder_items")
-        self._selected_table = self._db.table("selected_lists")
+        self._backend = open_backend(db_path, backend, **backend_options)
 
     # Private Methods
 
-    def _get_raw_list(self, list_id: int) -> Document:
-        reminder_list = self._lists_table.get(doc_id=list_id)
+    def _get_raw_list(self, list_id: int) -> dict:
+        reminder_list = self._backend.get(LISTS_TABLE, list_id)
 
         if not reminder_list:
             raise NotFoundException()
@@ -65,14 +332,109 @@ class ReminderStorage:
 
         return reminder_list
 
-    def _get_raw_item(self, item_id: int) -> Document:
-        item = self._items_table.get(doc_id=item_id)
+    def _get_raw_item(self, item_id: int) -> dict:
+        item = self._backend.get(ITEMS_TABLE, item_id)
         if not item:
             raise NotFoundException()
 
         self._verify_list_exists(item["list_id"])
         return item
 
+    def _get_raw_selected(self) -> Optional[dict]:
+        selected_lists = self._backend.find(SELECTED_TABLE, "owner", self.owner)
+        return selected_lists[0] if selected_lists else None
+
+    def _publish(self, kind: str, **data) -> None:
+        # Open pages of the same owner swap in the rows named by the event
+        broker.publish(self.owner, kind, **data)
+
+    def _fill_counts(self, list_rows: list[dict]) -> list[dict]:
+        """
+        Fills in the item counters of list rows written before lists carried them.
+        Rows that already have counters are returned without touching the items table.
+        """
+        missing = [row for row in list_rows if row.get("item_count") is None or row.get("done_count") is None]
+        if missing:
+            counts = {row["id"]: [0, 0] for row in missing}
+            for item in self._backend.find_many(ITEMS_TABLE, "list_id", list(counts)):
+                counts[item["list_id"]][0] += 1
+                counts[item["list_id"]][1] += item["completed"]
+            for row in missing:
+                row["item_count"], row["done_count"] = counts[row["id"]]
+        return list_rows
+
+    def _adjust_counts(self, list_id: int, item_delta: int, done_delta: int, **fields) -> None:
+        # Called inside the transaction that changed the items, after the change.
+        # Any `fields` are written to the list row in the same update.
+        list_row = self._backend.get(LISTS_TABLE, list_id)
+        if list_row.get("item_count") is None or list_row.get("done_count") is None:
+            # Counting rows written before counters existed already includes the change
+            self._fill_counts([list_row])
+        else:
+            list_row["item_count"] += item_delta
+            list_row["done_count"] += done_delta
+        counts = {"item_count": list_row["item_count"], "done_count": list_row["done_count"]}
+        self._backend.update(LISTS_TABLE, {**counts, **fields}, [list_id])
+
+    def _build_item_rows(self, list_id: Optional[int], items: list[dict]) -> list[dict]:
+        rows = []
+        for item in items:
+            row = {
+                "list_id": list_id,
+                "description": item["description"],
+                "completed": item.get("completed", False),
+            }
+            # Rows only carry a due time and a recurrence when they have one
+            if item.get("due_at") is not None:
+                row["due_at"] = item["due_at"]
+            if item.get("recurrence"):
+                row.update(_recurrence_fields(item.get("due_at"), item["recurrence"]))
+            rows.append(row)
+        return rows
+
+    def _sync_due(self, items: list[dict]) -> tuple[list[int], list[tuple[int, float]]]:
+        """
+        Replaces the due rows of items changed in the current transaction.
+        Only open items due in the future get one. Returns the item IDs and the
+        (item ID, due time) pairs to pass to the scheduler once the transaction commits.
+        """
+        item_ids = [item["id"] for item in items]
+        due_rows = self._backend.find_many(DUE_TABLE, "item_id", item_ids)
+        self._backend.remove(DUE_TABLE, [row["id"] for row in due_rows])
+
+        now = time.time()
+        pending = [
+            (item["id"], item["due_at"])
+            for item in items
+            if item.get("due_at") is not None and item["due_at"] > now and not item["completed"]
+        ]
+        due_rows = [
+            {"item_id": item_id, "owner": self.owner, "due_at": due_at} for item_id, due_at in pending
+        ]
+        self._backend.insert_many(DUE_TABLE, due_rows)
+        return item_ids, pending
+
+    def _remove_due(self, item_ids: list[int]) -> None:
+        # Called inside the transaction that removes the items
+        due_rows = self._backend.find_many(DUE_TABLE, "item_id", item_ids)
+        self._backend.remove(DUE_TABLE, [row["id"] for row in due_rows])
+
+    def _reschedule(self, cancelled: list[int], pending: list[tuple[int, float]]) -> None:
+        scheduler.cancel(self._backend, cancelled)
+        scheduler.schedule(self._backend, self.owner, pending)
+
+    def _renumber_positions(self, list_id: int, items: list[dict]) -> None:
+        """
+        Gives the items of a list, sorted by `_position_key`, fresh evenly spaced positions in that order.
+        Called inside a transaction. Costs one write per item, so moves only call it when
+        the neighbours they land between leave no room for a key.
+        """
+        for item, position in zip(items, keys_after(None, len(items))):
+            item["position"] = position
+            self._backend.update(ITEMS_TABLE, {"position": position}, [item["id"]])
+        if items:
+            self._backend.update(LISTS_TABLE, {"last_position": items[-1]["position"]}, [list_id])
+
     def _verify_list_exists(self, list_id: int) -> None:
         # Just get the list and make sure no exceptions happen
         self._get_raw_list(list_id)
@@ -83,80 +445,430 @@ class ReminderStorage:
 
     # Reminder Lists
 
+    @writes
     def create_list(self, name: str) -> int:
-        reminder_list = {"name": name, "owner": self.owner}
-        list_id = self._lists_table.insert(reminder_list)
+        reminder_list = {"name": name, "owner": self.owner, "item_count": 0, "done_count": 0}
+        list_id = self._backend.insert(LISTS_TABLE, reminder_list)
+        self._publish("lists")
         return list_id
 
+    @writes
     def delete_list(self, list_id: int) -> None:
-        self._verify_list_exists(list_id)
-        self._lists_table.remove(doc_ids=[list_id])
-        self._items_table.remove(Query().list_id == list_id)
+        with self._backend.transaction():
+            self._verify_list_exists(list_id)
+            item_ids = self._backend.find_ids(ITEMS_TABLE, "list_id", list_id)
+            self._backend.remove(LISTS_TABLE, [list_id])
+            self._backend.remove(ITEMS_TABLE, item_ids)
+            self._remove_due(item_ids)
+        self._reschedule(item_ids, [])
+        self._publish("lists")
 
     def get_list(self, list_id: int) -> ReminderList:
         reminder_list = self._get_raw_list(list_id)
-        reminder_list["id"] = list_id
-        model = ReminderList(**reminder_list)
+        model = ReminderList.from_row(self._fill_counts([reminder_list])[0])
         return model
 
     def get_lists(self) -> list[ReminderList]:
-        reminder_lists = self._lists_table.search(Query().owner == self.owner)
-        models = [ReminderList(id=rems.doc_id, **rems) for rems in reminder_lists]
+        reminder_lists = self._fill_counts(self._backend.find(LISTS_TABLE, "owner", self.owner))
+        models = [ReminderList.from_row(rems) for rems in reminder_lists]
         return models
 
+    def get_lists_with_items(
+        self, after_id: int = 0, limit: Optional[int] = None, with_items: bool = True
+    ) -> list[ReminderListWithItems]:
+        """
+        Returns the owner's lists with IDs greater than `after_id`, ordered by ID.
+        The items of every returned list are loaded with one lookup.
+        """
+        reminder_lists = self._backend.find(LISTS_TABLE, "owner", self.owner)
+        reminder_lists = [row for row in reminder_lists if row["id"] > after_id]
+        if limit is not None:
+            reminder_lists = reminder_lists[:limit]
+
+        items_by_list: dict[int, list[ReminderItem]] = {row["id"]: [] for row in reminder_lists}
+        if with_items and reminder_lists:
+            items = self._backend.find_many(ITEMS_TABLE, "list_id", list(items_by_list))
+            for item in sorted(items, key=_position_key):
+                items_by_list[item["list_id"]].append(ReminderItem.from_row(item))
+
+        return [
+            ReminderListWithItems(
+                row["id"], row["owner"], row["name"], items_by_list[row["id"]] if with_items else None
+            )
+            for row in reminder_lists
+        ]
+
+    def get_list_with_items(self, list_id: int, with_items: bool = True) -> ReminderListWithItems:
+        row = self._get_raw_list(list_id)
+        items = None
+        if with_items:
+            items = sorted(self._backend.find(ITEMS_TABLE, "list_id", list_id), key=_position_key)
+            items = [ReminderItem.from_row(item) for item in items]
+        return ReminderListWithItems(row["id"], row["owner"], row["name"], items)
+
+    @writes
+    def create_list_with_items(self, name: str, items: list[dict]) -> int:
+        """
+        Creates a list together with its items, given as dicts with "description",
+        "completed" and optionally "due_at".
+        """
+        item_count, done_count = len(items), sum(bool(item.get("completed")) for item in items)
+        counts = {"item_count": item_count, "done_count": done_count}
+        reminder_list = {"name": name, "owner": self.owner, **counts}
+
+        # Built first, so an invalid recurrence rule is rejected before anything is written
+        item_rows = self._build_item_rows(None, items)
+        if item_rows:
+            reminder_list["last_position"] = _assign_positions(item_rows, None)
+        with self._backend.transaction():
+            list_id = self._backend.insert(LISTS_TABLE, reminder_list)
+            for row in item_rows:
+                row["list_id"] = list_id
+            item_ids = self._backend.insert_many(ITEMS_TABLE, item_rows)
+            dated = [{**row, "id": item_id} for row, item_id in zip(item_rows, item_ids) if "due_at" in row]
+            cancelled, pending = self._sync_due(dated)
+        self._reschedule(cancelled, pending)
+        self._publish("lists")
+        return list_id
+
+    @writes
+    def replace_list(self, list_id: int, name: str, items: list[dict]) -> None:
+        """
+        Renames a list and replaces all of its items as one transaction.
+        """
+        item_rows = self._build_item_rows(list_id, items)
+        last_position = _assign_positions(item_rows, None)
+        with self._backend.transaction():
+            self._verify_list_exists(list_id)
+            done_count = sum(bool(item.get("completed")) for item in items)
+            fields = {"name": name, "item_count": len(items), "done_count": done_count}
+            if last_position is not None:
+                fields["last_position"] = last_position
+            self._backend.update(LISTS_TABLE, fields, [list_id])
+            old_ids = self._backend.find_ids(ITEMS_TABLE, "list_id", list_id)
+            self._backend.remove(ITEMS_TABLE, old_ids)
+            self._remove_due(old_ids)
+
+            item_ids = self._backend.insert_many(ITEMS_TABLE, item_rows)
+            dated = [{**row, "id": item_id} for row, item_id in zip(item_rows, item_ids) if "due_at" in row]
+            cancelled, pending = self._sync_due(dated)
+        self._reschedule(old_ids + cancelled, pending)
+        self._publish("list", list_id=list_id)
+        self._publish("items", list_id=list_id)
+
+    @writes
     def update_list_name(self, list_id: int, new_name: str) -> None:
-        reminder_list = self._get_raw_list(list_id)
-        reminder_list["name"] = new_name
-        self._lists_table.update(reminder_list, doc_ids=[list_id])
+        with self._backend.transaction():
+            self._verify_list_exists(list_id)
+            self._backend.update(LISTS_TABLE, {"name": new_name}, [list_id])
+        self._publish("list", list_id=list_id)
 
     # Reminder Items
 
-    def add_item(self, list_id: int, description: str) -> int:
-        reminder_item = {
-            "list_id": list_id,
-            "description": description,
-            "completed": False,
-        }
-
-        self._verify_list_exists(list_id)
-        item_id = self._items_table.insert(reminder_item)
+    @writes
+    def add_item(self, list_id: int, description: str, due_at: Optional[float] = None) -> int:
+        reminder_item = self._build_item_rows(list_id, [{"description": description, "due_at": due_at}])[0]
+
+        cancelled, pending = [], []
+        with self._backend.transaction():
+            # New items go to the end of the list
+            list_row = self._get_raw_list(list_id)
+            last_position = _assign_positions([reminder_item], list_row.get("last_position"))
+            item_id = self._backend.insert(ITEMS_TABLE, reminder_item)
+            self._adjust_counts(list_id, 1, 0, last_position=last_position)
+            if due_at is not None:
+                cancelled, pending = self._sync_due([{**reminder_item, "id": item_id}])
+        self._reschedule(cancelled, pending)
+        self._publish("item", list_id=list_id, item_ids=[item_id])
         return item_id
 
+    @writes
     def delete_item(self, item_id: int) -> None:
-        self._verify_item_exists(item_id)
-        self._items_table.remove(doc_ids=[item_id])
-
-    def get_items(self, list_id: int) -> list[ReminderItem]:
+        with self._backend.transaction():
+            item = self._get_raw_item(item_id)
+            self._backend.remove(ITEMS_TABLE, [item_id])
+            self._adjust_counts(item["list_id"], -1, -int(item["completed"]))
+            if item.get("due_at") is not None:
+                self._remove_due([item_id])
+        self._reschedule([item_id], [])
+        self._publish("item-deleted", list_id=item["list_id"], item_ids=[item_id])
+
+    @writes
+    def add_items(self, list_id: int, descriptions: list[str]) -> list[int]:
+        reminder_items = self._build_item_rows(list_id, [{"description": text} for text in descriptions])
+
+        with self._backend.transaction():
+            list_row = self._get_raw_list(list_id)
+            last_position = _assign_positions(reminder_items, list_row.get("last_position"))
+            item_ids = self._backend.insert_many(ITEMS_TABLE, reminder_items)
+            fields = {"last_position": last_position} if item_ids else {}
+            self._adjust_counts(list_id, len(item_ids), 0, **fields)
+        self._publish("item", list_id=list_id, item_ids=item_ids)
+        return item_ids
+
+    @writes
+    def delete_items(self, item_ids: list[int]) -> None:
+        # An ID given twice must only be removed and counted once
+        item_ids = list(dict.fromkeys(item_ids))
+        with self._backend.transaction():
+            items = [self._backend.get(ITEMS_TABLE, item_id) for item_id in item_ids]
+            if not all(items):
+                raise NotFoundException()
+
+            # One lookup of the owner's lists covers every item
+            owned_ids = set(self._backend.find_ids(LISTS_TABLE, "owner", self.owner))
+            for list_id in {item["list_id"] for item in items} - owned_ids:
+                self._verify_list_exists(list_id)
+
+            self._backend.remove(ITEMS_TABLE, item_ids)
+            removed_by_list: dict[int, list[dict]] = {}
+            for item in items:
+                removed_by_list.setdefault(item["list_id"], []).append(item)
+            for list_id, removed in removed_by_list.items():
+                self._adjust_counts(list_id, -len(removed), -sum(item["completed"] for item in removed))
+            self._remove_due([item["id"] for item in items if item.get("due_at") is not None])
+
+        self._reschedule(item_ids, [])
+        for list_id, removed in removed_by_list.items():
+            self._publish("item-deleted", list_id=list_id, item_ids=[item["id"] for item in removed])
+
+    @writes
+    def set_items_completed(self, list_id: int, completed: bool) -> int:
+        with self._backend.transaction():
+            self._verify_list_exists(list_id)
+            items = self._backend.find(ITEMS_TABLE, "list_id", list_id)
+            changed = [item for item in items if item["completed"] != completed]
+            # Completing a recurring item moves it on to its next occurrence instead
+            advanced = [item for item in changed if completed and item.get("recurrence")]
+            changed = [item for item in changed if not (completed and item.get("recurrence"))]
+
+            item_ids = [item["id"] for item in changed]
+            if item_ids:
+                self._backend.update(ITEMS_TABLE, {"completed": completed}, item_ids)
+                self._adjust_counts(list_id, 0, len(item_ids) if completed else -len(item_ids))
+            dated = [{**item, "completed": completed} for item in changed if item.get("due_at") is not None]
+
+            now = time.time()
+            for item in advanced:
+                item["due_at"] = _next_occurrence(item, now)
+                self._backend.update(ITEMS_TABLE, {"due_at": item["due_at"]}, [item["id"]])
+                dated.append(item)
+            cancelled, pending = self._sync_due(dated) if dated else ([], [])
+        self._reschedule(cancelled, pending)
+        self._publish("items", list_id=list_id)
+        return len(item_ids) + len(advanced)
+
+    @writes
+    def clear_completed_items(self, list_id: int) -> int:
+        with self._backend.transaction():
+            self._verify_list_exists(list_id)
+            items = self._backend.find(ITEMS_TABLE, "list_id", list_id)
+            item_ids = [item["id"] for item in items if item["completed"]]
+            if item_ids:
+                self._backend.remove(ITEMS_TABLE, item_ids)
+                self._adjust_counts(list_id, -len(item_ids), -len(item_ids))
+        self._publish("items", list_id=list_id)
+        return len(item_ids)
+
+    def get_items(
+        self, list_id: int, cursor: Optional[str] = None, limit: Optional[int] = None
+    ) -> list[ReminderItem]:
+        return self.get_items_page(list_id, cursor, limit).items
+
+    def get_items_page(
+        self, list_id: int, cursor: Optional[str] = None, limit: Optional[int] = None
+    ) -> ItemsPage:
+        """
+        Returns up to `limit` items of a list that come after `cursor`, completed items last.
+        Pass the returned `next_cursor` back in to get the following page.
+        """
         self._verify_list_exists(list_id)
-        items = self._items_table.search(Query().list_id == list_id)
-        models = [ReminderItem(id=item.doc_id, **item) for item in items]
-        sorted_models = sorted(models, key=lambda item: item.completed)
-        return sorted_models
+        items = self._backend.find(ITEMS_TABLE, "list_id", list_id)
+        return _page_items(items, cursor, limit)
+
+    def get_item_counts(self, list_id: int) -> tuple[int, int]:
+        """
+        Returns the (working, done) item counts of a list from its counters.
+        """
+        reminder_list = self._fill_counts([self._get_raw_list(list_id)])[0]
+        return reminder_list["item_count"] - reminder_list["done_count"], reminder_list["done_count"]
 
     def get_item(self, item_id: int) -> ReminderItem:
         item = self._get_raw_item(item_id)
-        item["id"] = item_id
-        model = ReminderItem(**item)
+        model = ReminderItem.from_row(item)
         return model
 
+    @writes
     def strike_item(self, item_id: int) -> None:
-        item = self._get_raw_item(item_id)
-        item["completed"] = not item["completed"]
-        self._items_table.update(item, doc_ids=[item_id])
-
+        with self._backend.transaction():
+            item = self._get_raw_item(item_id)
+            if item.get("recurrence") and not item["completed"]:
+                # Completing an occurrence advances the rule; the item stays open for the next one
+                item["due_at"] = _next_occurrence(item, time.time())
+                self._backend.update(ITEMS_TABLE, {"due_at": item["due_at"]}, [item_id])
+            else:
+                self._backend.update(ITEMS_TABLE, {"completed": not item["completed"]}, [item_id])
+                self._adjust_counts(item["list_id"], 0, -1 if item["completed"] else 1)
+                item["completed"] = not item["completed"]
+
+            # Completing an item cancels its reminder, and reopening it restores one that is still ahead
+            cancelled, pending = [], []
+            if item.get("due_at") is not None:
+                cancelled, pending = self._sync_due([item])
+        self._reschedule(cancelled, pending)
+        self._publish("item", list_id=item["list_id"], item_ids=[item_id])
+
+    @writes
+    def move_item(self, item_id: int, after_id: Optional[int] = None) -> str:
+        """
+        Moves an item to just after the item `after_id` of the same list, or to the top without one.
+        Completed items stay below the open ones, so the move only reorders the item within its group.
+        Only the moved item's row is written, plus the list row when it moves past every other item.
+        Returns the item's new position key. Call `rebalance_positions` once keys get long.
+        """
+        with self._backend.transaction():
+            item = self._get_raw_item(item_id)
+            list_id = item["list_id"]
+            items = sorted(self._backend.find(ITEMS_TABLE, "list_id", list_id), key=_position_key)
+            others = [row for row in items if row["id"] != item_id]
+
+            index = 0
+            if after_id is not None:
+                index = next((index + 1 for index, row in enumerate(others) if row["id"] == after_id), None)
+                if index is None:
+                    raise NotFoundException()
+            before = others[index - 1] if index > 0 else None
+            after = others[index] if index < len(others) else None
+
+            # Items without positions, or with equal ones, leave no room between them
+            if not all(row.get("position") for row in items) or (
+                before and after and before["position"] >= after["position"]
+            ):
+                self._renumber_positions(list_id, items)
+
+            # Moving past the last item stays below the list's last position when there is room
+            last_position = self._backend.get(LISTS_TABLE, list_id).get("last_position")
+            upper = after["position"] if after else last_position
+            if before and upper and before["position"] >= upper:
+                upper = None
+            position = key_between(before and before["position"], upper)
+            self._backend.update(ITEMS_TABLE, {"position": position}, [item_id])
+            if last_position is None or position > last_position:
+                self._backend.update(LISTS_TABLE, {"last_position": position}, [list_id])
+
+        self._publish("items", list_id=list_id)
+        return position
+
+    @writes
+    def rebalance_positions(self, list_id: int) -> None:
+        """
+        Replaces the position keys of a list's items with short, evenly spaced ones in the same order.
+        """
+        with self._backend.transaction():
+            self._verify_list_exists(list_id)
+            items = sorted(self._backend.find(ITEMS_TABLE, "list_id", list_id), key=_position_key)
+            self._renumber_positions(list_id, items)
+
+    @writes
     def update_item_description(self, item_id: int, new_description: str) -> None:
+        with self._backend.transaction():
+            item = self._get_raw_item(item_id)
+            self._backend.update(ITEMS_TABLE, {"description": new_description}, [item_id])
+        self._publish("item", list_id=item["list_id"], item_ids=[item_id])
+
+    # Due Reminders
+
+    @writes
+    def set_item_due(self, item_id: int, due_at: Optional[float], recurrence: Optional[str] = None) -> None:
+        """
+        Sets or, with None, clears the time the item's reminder falls due, as a Unix timestamp.
+        With a `recurrence` rule like "daily" or "every 3 days", `due_at` is its first occurrence.
+        """
+        fields = {"due_at": due_at, **_recurrence_fields(due_at, recurrence)}
+        with self._backend.transaction():
+            item = self._get_raw_item(item_id)
+            self._backend.update(ITEMS_TABLE, fields, [item_id])
+            cancelled, pending = self._sync_due([{**item, **fields}])
+        self._reschedule(cancelled, pending)
+        self._publish("item", list_id=item["list_id"], item_ids=[item_id])
+
+    def get_occurrences(self, item_id: int, limit: int = 10) -> list[float]:
+        """
+        Returns the due times of the next `limit` occurrences of an item, starting with its current one.
+        Items that do not recur have at most one.
+        """
         item = self._get_raw_item(item_id)
-        item["description"] = new_description
-        self._items_table.update(item, doc_ids=[item_id])
+        if item.get("due_at") is None:
+            return []
+        if not item.get("recurrence"):
+            return [item["due_at"]]
+
+        rule = Recurrence.parse(item["recurrence"])
+        later = rule.occurrences(item["recurrence_start"], after=item["due_at"])
+        return [item["due_at"], *islice(later, limit - 1)] if limit > 0 else []
+
+    @writes
+    def claim_due_items(self, item_ids: list[int]) -> list[ReminderItem]:
+        """
+        Takes the reminders of the given items that have fallen due and returns their open items.
+        Each reminder can only be claimed once, even by several processes.
+        """
+        now = time.time()
+        with self._backend.transaction():
+            due_rows = self._backend.find_many(DUE_TABLE, "item_id", item_ids)
+            due_rows = [row for row in due_rows if row["owner"] == self.owner and row["due_at"] <= now]
+            self._backend.remove(DUE_TABLE, [row["id"] for row in due_rows])
+            items = [self._backend.get(ITEMS_TABLE, row["item_id"]) for row in due_rows]
+        return [ReminderItem.from_row(item) for item in items if item and not item["completed"]]
+
+    # Data Versions
+
+    def data_version(self) -> str:
+        return self._backend.data_version(self.owner)
 
     # Selected Lists
 
+    def get_page_data(self, items_limit: Optional[int] = None) -> PageData:
+        """
+        Loads everything the reminders grid shows with one indexed lookup per table.
+        The selected list is taken from the owner's lists, so it needs no separate ownership check.
+        With `items_limit`, only the first page of the selected list's items is loaded.
+        """
+        reminder_lists = self._fill_counts(self._backend.find(LISTS_TABLE, "owner", self.owner))
+        selected_list = None
+        working_count = done_count = 0
+
+        selected = self._get_raw_selected()
+        if selected and selected["list_id"] is not None:
+            list_row = next((row for row in reminder_lists if row["id"] == selected["list_id"]), None)
+            if list_row is None:
+                self._backend.update(SELECTED_TABLE, {"list_id": None}, [selected["id"]])
+            else:
+                done_count = list_row["done_count"]
+                working_count = list_row["item_count"] - done_count
+                items = self._backend.find(ITEMS_TABLE, "list_id", list_row["id"])
+                page = _page_items(items, None, items_limit)
+                selected_list = SelectedList(
+                    list_row["id"], list_row["owner"], list_row["name"], page.items, page.next_cursor
+                )
+
+        return PageData(
+            lists=[ReminderList.from_row(row) for row in reminder_lists],
+            selected_list=selected_list,
+            working_count=working_count,
+            done_count=done_count,
+        )
+
+    def get_selected_list_id(self) -> Optional[int]:
+        selected_list = self._get_raw_selected()
+        return selected_list["list_id"] if selected_list else None
+
     def get_selected_list(self) -> Optional[SelectedList]:
-        selected_list = self._selected_table.search(Query().owner == self.owner)
+        selected_list = self._get_raw_selected()
         if not selected_list:
             return None
 
-        list_id = selected_list[0]["list_id"]
+        list_id = selected_list["list_id"]
         if list_id is None:
             return None
 
@@ -164,7 +876,7 @@ class ReminderStorage:
             reminder_list = self.get_list(list_id)
             reminder_items = self.get_items(list_id)
         except Exception:
-            self._selected_table.update({"list_id": None}, Query().owner == self.owner)
+            self._backend.update(SELECTED_TABLE, {"list_id": None}, [selected_list["id"]])
             return None
 
         return SelectedList(
@@ -174,18 +886,96 @@ class ReminderStorage:
             items=reminder_items,
         )
 
+    @writes
     def set_selected_list(self, list_id: Optional[int]) -> None:
-        selected_list = self._selected_table.search(Query().owner == self.owner)
+        with self._backend.transaction():
+            selected_list = self._get_raw_selected()
 
-        if selected_list:
-            self._selected_table.update({"list_id": list_id}, Query().owner == self.owner)
-        else:
-            self._selected_table.insert({"owner": self.owner, "list_id": list_id})
+            if selected_list:
+                self._backend.update(SELECTED_TABLE, {"list_id": list_id}, [selected_list["id"]])
+            else:
+                self._backend.insert(SELECTED_TABLE, {"owner": self.owner, "list_id": list_id})
+        self._publish("lists")
 
+    @writes
     def reset_selected_after_delete(self, deleted_id: int) -> None:
-        selected_list = self._selected_table.search(Query().owner == self.owner)
+        with self._backend.transaction():
+            selected_list = self._get_raw_selected()
+
+            if selected_list and selected_list["list_id"] == deleted_id:
+                list_ids = self._backend.find_ids(LISTS_TABLE, "owner", self.owner)
+                list_id = list_ids[0] if list_ids else None
+                self.set_selected_list(list_id)
+
+
+# --------------------------------------------------------------------------------
+# AsyncReminderStorage Class
+# --------------------------------------------------------------------------------
+
 
-        if selected_list and selected_list[0]["list_id"] == deleted_id:
-            reminder_lists = self._lists_table.all()
-            list_id = reminder_lists[0].doc_id if reminder_lists else None
-            self.set_selected_list(list_id)
+class AsyncReminderStorage:
+    """
+    Awaitable facade over ReminderStorage for the async routes.
+    Every public ReminderStorage method is available as a coroutine with the same signature.
+    """
+
+    def __init__(self, storage: ReminderStorage) -> None:
+        self.storage = storage
+        self.owner = storage.owner
+
+    def data_version(self) -> str:
+        # An in-memory lookup, so it is not worth a trip to the thread pool
+        return self.storage.data_version()
+
+    async def move_item(self, item_id: int, after_id: Optional[int] = None) -> str:
+        """
+        Moves an item like ReminderStorage.move_item, and rebalances its list's keys
+        in the background once they get longer than MAX_POSITION_LENGTH.
+        """
+        position = await self._run(self.storage.move_item, item_id, after_id)
+        if len(position) > MAX_POSITION_LENGTH:
+            list_id = (await self._run(self.storage.get_item, item_id)).list_id
+            self._run_in_background(self.storage.rebalance_positions, list_id)
+        return position
+
+    def _run_in_background(self, method: Callable, *args) -> None:
+        # Queues behind the same write lock as every other write; failures are logged, not lost
+        task = asyncio.get_running_loop().create_task(self._run(method, *args))
+        _background_writes.add(task)
+        task.add_done_callback(_finish_background_write)
+
+    def __getattr__(self, name: str):
+        method = getattr(self.storage, name)
+        if name.startswith("_") or not callable(method):
+            raise AttributeError(name)
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            return await self._run(method, *args, **kwargs)
+
+        return call
+
+    async def _run(self, method: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Keep request-scoped context variables visible inside the pool thread
+        call = functools.partial(contextvars.copy_context().run, method, *args, **kwargs)
+
+        # Timed from the event loop, so waiting for a pool thread or the write lock counts too
+        if not getattr(method, "writes", False):
+            with timed("read"):
+                return await loop.run_in_executor(_executor, call)
+
+        backend = self.storage._backend
+        write_lock = _write_locks.get(backend)
+        if write_lock is None:
+            write_lock = _write_locks.setdefault(backend, asyncio.Lock())
+
+        with timed("write"):
+            async with write_lock:
+                return await loop.run_in_executor(_executor, call)
+
+
+def _finish_background_write(task: asyncio.Task) -> None:
+    _background_writes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background storage write failed", exc_info=task.exception())
@@ -0,0 +1,191 @@
+"""
+This module provides per-request stage timing, reported in a Server-Timing header
+and aggregated per route into in-process histograms.
+
+Code that does the work of a stage wraps it in `timed(stage)`. Outside of a timed
+request that is one context variable lookup, so the hooks can stay in place when
+the middleware is turned off.
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import contextvars
+import threading
+import time
+
+from app.utils.metrics import Collected, Counter, Histogram
+from fastapi.templating import Jinja2Templates
+from typing import Optional
+
+
+# --------------------------------------------------------------------------------
+# Request Timers
+# --------------------------------------------------------------------------------
+
+
+class RequestTimer:
+    """
+    The time one request spent in each stage, in seconds.
+    Stages that overlap, like storage calls gathered concurrently, add up to more than their wall time.
+    """
+
+    __slots__ = ("start", "durations")
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.durations: dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def header(self, total: float) -> str:
+        metrics = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.durations.items()]
+        metrics.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(metrics)
+
+
+request_timer: contextvars.ContextVar[Optional[RequestTimer]] = contextvars.ContextVar(
+    "request_timer", default=None
+)
+
+
+class _StageTimer:
+    __slots__ = ("timer", "stage", "start")
+
+    def __init__(self, timer: RequestTimer, stage: str) -> None:
+        self.timer = timer
+        self.stage = stage
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.timer.add(self.stage, time.perf_counter() - self.start)
+
+
+class _Untimed:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_untimed = _Untimed()
+
+
+def timed(stage: str):
+    """
+    Returns a context manager that adds the time spent inside it to a stage of the current request.
+    Outside of a timed request it returns a shared no-op, so nothing is allocated.
+    """
+    timer = request_timer.get()
+    return _untimed if timer is None else _StageTimer(timer, stage)
+
+
+templates_rendered = Counter(
+    "reminders_templates_rendered_total", "Template responses rendered, by template.", ("template",)
+)
+
+
+class TimedJinja2Templates(Jinja2Templates):
+    """
+    Jinja2Templates that times and counts rendering. fasthx renders through TemplateResponse too.
+    """
+
+    def TemplateResponse(self, *args, **kwargs):
+        # Both the (name, context) and the newer (request, name, context) signatures are in use
+        name = kwargs.get("name") or next((arg for arg in args if isinstance(arg, str)), "unknown")
+        templates_rendered.inc(name)
+        with timed("render"):
+            return super().TemplateResponse(*args, **kwargs)
+
+
+# --------------------------------------------------------------------------------
+# Route Timings
+# --------------------------------------------------------------------------------
+
+
+class RouteTimings:
+    """
+    Histograms of each stage's time per request, keyed by method and route path.
+    Route paths are the templates like "/reminders/item-row/{item_id}", so the number of keys stays small.
+    """
+
+    def __init__(self) -> None:
+        self._histograms: dict[tuple[str, str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, method: str, route: str, timer: RequestTimer, total: float) -> None:
+        with self._lock:
+            for stage, seconds in [*timer.durations.items(), ("total", total)]:
+                key = (method, route, stage)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram()
+                histogram.observe(seconds)
+
+    def snapshot(self) -> dict[tuple[str, str, str], Histogram]:
+        """
+        Returns copies of the histograms, keyed by (method, route, stage).
+        """
+        with self._lock:
+            return {key: histogram.copy() for key, histogram in self._histograms.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+route_timings = RouteTimings()
+
+Collected(
+    "reminders_request_stage_seconds",
+    "Time HTTP requests spent in each stage, by method and route.",
+    "histogram",
+    lambda: route_timings.snapshot().items(),
+    ("method", "route", "stage"),
+)
+
+
+# --------------------------------------------------------------------------------
+# Middleware
+# --------------------------------------------------------------------------------
+
+
+class ServerTimingMiddleware:
+    """
+    Times every HTTP request, adds a Server-Timing header with its stages and records them per route.
+    The total is the time until the response starts, so streaming responses are timed like any other.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = request_timer.set(timer)
+
+        async def send_with_timing(message) -> None:
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - timer.start
+                # Mounted apps like /static have no route, but their mount path is in root_path
+                route = getattr(scope.get("route"), "path", None) or scope.get("root_path") or "unmatched"
+                route_timings.record(scope["method"], route, timer, total)
+
+                header = (b"server-timing", timer.header(total).encode())
+                message["headers"] = [*message.get("headers", ()), header]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timer.reset(token)
@@ -0,0 +1,331 @@
+"""
+This module load-tests the app's HTMX and JSON endpoints in process.
+
+It seeds a fresh database with generated users, lists and items, then drives
+the full reminders page, the add, strike and delete item partials and the JSON
+API through an in-process ASGI client. Each scenario reports its throughput and
+p50/p95/p99 latency. Results are written as JSON, and can be compared with an
+earlier run to catch regressions as the database grows.
+
+Usage:
+    python -m benchmarks.bench_endpoints
+    python -m benchmarks.bench_endpoints --items 100000 --lists 20 --output bench.json
+    python -m benchmarks.bench_endpoints --items 100000 --lists 20 --baseline bench.json
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import secrets
+import sys
+import tempfile
+import time
+
+from app import users
+from app.main import app
+from app.utils.auth import (
+    auth_cookie_name,
+    get_storage_for_api,
+    get_storage_for_page,
+    get_username_for_api,
+    get_username_for_page,
+    serialize_token,
+)
+from app.utils.backends import BACKENDS, close_backends
+from app.utils.storage import AsyncReminderStorage, ReminderStorage
+
+from dataclasses import dataclass
+from fastapi import Depends
+from httpx import ASGITransport, AsyncClient
+from typing import Callable, Optional
+
+
+# --------------------------------------------------------------------------------
+# Globals
+# --------------------------------------------------------------------------------
+
+# The latency figures compared against a baseline, and whether lower is better
+COMPARED_METRICS = {"p50_ms": True, "p95_ms": True, "p99_ms": True, "throughput_rps": False}
+
+
+# --------------------------------------------------------------------------------
+# Seeding
+# --------------------------------------------------------------------------------
+
+
+@dataclass
+class BenchUser:
+    username: str
+    client: AsyncClient
+    item_ids: list[int]
+
+
+def seed(db_path: str, backend: str, user_count: int, list_count: int, item_count: int) -> dict[str, list]:
+    """
+    Fills a database with `list_count` lists and `item_count` items per user, a third of them completed.
+    The first list of each user is selected. Returns the item IDs of each user.
+    """
+    user_items = {}
+    for user_number in range(user_count):
+        username = f"bench-user-{user_number}"
+        storage = ReminderStorage(owner=username, db_path=db_path, backend=backend)
+
+        list_ids = []
+        for list_number in range(list_count):
+            # Spread the items evenly, with any remainder on the first lists
+            size = item_count // list_count + (list_number < item_count % list_count)
+            items = [
+                {"description": f"item {list_number}.{number}", "completed": number % 3 == 0}
+                for number in range(size)
+            ]
+            list_ids.append(storage.create_list_with_items(f"List {list_number}", items))
+
+        storage.set_selected_list(list_ids[0])
+        user_items[username] = [item.id for list_id in list_ids for item in storage.get_items(list_id)]
+    return user_items
+
+
+# --------------------------------------------------------------------------------
+# Scenarios
+# --------------------------------------------------------------------------------
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: Callable[[BenchUser, int], str]
+    data: Optional[dict] = None
+
+
+def _item_id(user: BenchUser, number: int) -> int:
+    return user.item_ids[number % len(user.item_ids)]
+
+
+def _deleted_item_id(user: BenchUser, number: int) -> int:
+    # Deletes take items from the end, so every request deletes a different one
+    return user.item_ids.pop()
+
+
+SCENARIOS = [
+    Scenario("GET /reminders", "GET", lambda user, number: "/reminders"),
+    Scenario("GET /api/reminders", "GET", lambda user, number: "/api/reminders"),
+    Scenario(
+        "POST new item row",
+        "POST",
+        lambda user, number: "/reminders/new-item-row",
+        {"reminder_item_name": "new"},
+    ),
+    Scenario(
+        "PATCH strike item row",
+        "PATCH",
+        lambda user, number: f"/reminders/item-row-strike/{_item_id(user, number)}",
+    ),
+    Scenario(
+        "DELETE item row",
+        "DELETE",
+        lambda user, number: f"/reminders/item-row/{_deleted_item_id(user, number)}",
+    ),
+]
+
+
+# --------------------------------------------------------------------------------
+# Measurement
+# --------------------------------------------------------------------------------
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    # Nearest-rank percentile, so every reported figure is a latency that really happened
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def run_scenario(
+    scenario: Scenario, bench_users: list[BenchUser], requests: int, concurrency: int
+) -> tuple[list[float], int, float]:
+    """
+    Sends `requests` requests from `concurrency` concurrent workers, spread over the users.
+    Returns the latencies in seconds, the number of failed requests and the elapsed time.
+    """
+    latencies: list[float] = []
+    errors = 0
+    next_number = 0
+
+    async def worker() -> None:
+        nonlocal errors, next_number
+        while next_number < requests:
+            number, next_number = next_number, next_number + 1
+            user = bench_users[number % len(bench_users)]
+            path = scenario.path(user, number // len(bench_users))
+
+            start = time.perf_counter()
+            response = await user.client.request(scenario.method, path, data=scenario.data)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    sorted_ms = sorted(latency * 1000 for latency in latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(sorted_ms) / len(sorted_ms), 3),
+        "p50_ms": round(percentile(sorted_ms, 50), 3),
+        "p95_ms": round(percentile(sorted_ms, 95), 3),
+        "p99_ms": round(percentile(sorted_ms, 99), 3),
+    }
+
+
+# --------------------------------------------------------------------------------
+# Running
+# --------------------------------------------------------------------------------
+
+
+async def _run(options: argparse.Namespace, db_path: str) -> dict:
+    user_items = seed(db_path, options.backend, options.users, options.lists, options.items)
+
+    # Route every request to the seeded database instead of the configured one
+    def storage_for(username: str) -> AsyncReminderStorage:
+        return AsyncReminderStorage(ReminderStorage(owner=username, db_path=db_path, backend=options.backend))
+
+    def storage_for_page(username: str = Depends(get_username_for_page)) -> AsyncReminderStorage:
+        return storage_for(username)
+
+    def storage_for_api(username: str = Depends(get_username_for_api)) -> AsyncReminderStorage:
+        return storage_for(username)
+
+    app.dependency_overrides[get_storage_for_page] = storage_for_page
+    app.dependency_overrides[get_storage_for_api] = storage_for_api
+    users.update({username: secrets.token_urlsafe() for username in user_items})
+
+    bench_users = []
+    try:
+        for username, item_ids in user_items.items():
+            # Requests look like the ones HTMX sends, so the partial routes render their templates
+            client = AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://bench", headers={"HX-Request": "true"}
+            )
+            client.cookies.set(auth_cookie_name, serialize_token(username))
+            bench_users.append(BenchUser(username, client, item_ids))
+
+        results = {}
+        for scenario in SCENARIOS:
+            if options.only and scenario.name not in options.only:
+                continue
+            await run_scenario(scenario, bench_users, options.warmup, options.concurrency)
+            latencies, errors, elapsed = await run_scenario(
+                scenario, bench_users, options.requests, options.concurrency
+            )
+            results[scenario.name] = summarize(latencies, errors, elapsed)
+        return results
+    finally:
+        for bench_user in bench_users:
+            await bench_user.client.aclose()
+        for username in user_items:
+            users.pop(username, None)
+        app.dependency_overrides.pop(get_storage_for_page, None)
+        app.dependency_overrides.pop(get_storage_for_api, None)
+        close_backends()
+
+
+def run(options: argparse.Namespace) -> dict:
+    """
+    Seeds a database in a temporary directory, runs every scenario against it
+    and returns the configuration and the results.
+    """
+    deletes = math.ceil((options.warmup + options.requests) / options.users)
+    if options.items < deletes:
+        raise ValueError(f"the delete scenario needs at least {deletes} items per user")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = f"{temp_dir}/reminder_db.{'db' if options.backend == 'sqlite' else 'json'}"
+        scenarios = asyncio.run(_run(options, db_path))
+
+    config = {
+        "backend": options.backend,
+        "users": options.users,
+        "lists": options.lists,
+        "items": options.items,
+        "requests": options.requests,
+        "concurrency": options.concurrency,
+        "python": platform.python_version(),
+    }
+    return {"config": config, "scenarios": scenarios}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Prints how each scenario moved against the baseline.
+    Returns the scenarios and metrics that got worse by more than `tolerance` percent.
+    """
+    if results["config"] != baseline["config"]:
+        print("warning: the baseline was run with a different configuration", file=sys.stderr)
+
+    regressions = []
+    for name, metrics in results["scenarios"].items():
+        baseline_metrics = baseline["scenarios"].get(name)
+        if baseline_metrics is None:
+            continue
+
+        changes = []
+        for metric, lower_is_better in COMPARED_METRICS.items():
+            before, after = baseline_metrics[metric], metrics[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            changes.append(f"{metric} {change:+6.1f}%")
+            if (change if lower_is_better else -change) > tolerance:
+                regressions.append(f"{name}: {metric} {before} -> {after}")
+        print(f"{name:<24} {'  '.join(changes)}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the reminders endpoints in process")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="tinydb")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--lists", type=int, default=10, help="lists per user")
+    parser.add_argument("--items", type=int, default=1000, help="items per user, spread over the lists")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", action="append", help="run only this scenario (repeatable)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="allowed regression in percent")
+    options = parser.parse_args(argv)
+
+    results = run(options)
+    for name, metrics in results["scenarios"].items():
+        print(
+            f"{name:<24} {metrics['throughput_rps']:9.1f} req/s  p50 {metrics['p50_ms']:8.2f} ms"
+            f"  p95 {metrics['p95_ms']:8.2f} ms  p99 {metrics['p99_ms']:8.2f} ms  errors {metrics['errors']}"
+        )
+
+    if options.output:
+        with open(options.output, "w") as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+            output_file.write("\n")
+
+    failed = any(metrics["errors"] for metrics in results["scenarios"].values())
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), options.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+This module compares the cost of building row objects for a long reminder list.
+
+It times and measures the allocations of turning 10k item rows into Pydantic
+models, plus the copy the item routes used to make, and into the __slots__
+rows ReminderStorage returns now.
+
+Usage:
+    python -m benchmarks.bench_rows
+    python -m benchmarks.bench_rows --items 50000 --repeat 10
+"""
+
+# --------------------------------------------------------------------------------
+# Imports
+# --------------------------------------------------------------------------------
+
+import argparse
+import time
+import tracemalloc
+
+from app.utils.storage import ReminderItem
+
+from pydantic import BaseModel
+from typing import Callable
+
+
+# --------------------------------------------------------------------------------
+# Models
+# --------------------------------------------------------------------------------
+
+
+class PydanticReminderItem(BaseModel):
+    id: int
+    list_id: int
+    description: str
+    completed: bool
+
+
+# --------------------------------------------------------------------------------
+# Benchmarks
+# --------------------------------------------------------------------------------
+
+
+def _build_rows(count: int) -> list[dict]:
+    return [
+        {"id": doc_id, "list_id": 1, "description": f"item {doc_id}", "completed": doc_id % 3 == 0}
+        for doc_id in range(1, count + 1)
+    ]
+
+
+def build_pydantic(rows: list[dict]) -> list:
+    models = [PydanticReminderItem(**row) for row in rows]
+    return [PydanticReminderItem(**model.model_dump()) for model in models]
+
+
+def build_slots(rows: list[dict]) -> list:
+    return [ReminderItem.from_row(row) for row in rows]
+
+
+def measure(build: Callable[[list[dict]], list], rows: list[dict], repeat: int) -> tuple[float, int]:
+    """
+    Returns the best time in seconds and the bytes still allocated by the result.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build(rows)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = build(rows)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, allocated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare Pydantic and __slots__ rows")
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = _build_rows(args.items)
+    for name, build in [("pydantic + copy", build_pydantic), ("__slots__ rows", build_slots)]:
+        seconds, allocated = measure(build, rows, args.repeat)
+        print(f"{name:<20} {seconds * 1000:8.2f} ms  {allocated / 1024:10.1f} KiB  per {args.items} items")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+// Item rows can move between pages while the user scrolls: a row added or completed
+// on this page may come back again with a later page. Keep the copy already shown.
+htmx.onLoad(function (element) {
+    var dataId = element.getAttribute && element.getAttribute("data-id");
+    if (!dataId || dataId.indexOf("reminder-item-row-") !== 0) {
+        return;
+    }
+
+    var copies = document.querySelectorAll('[data-id="' + dataId + '"]');
+    if (copies.length > 1) {
+        element.remove();
+    }
+});
+
+// Live updates: other tabs and devices of the same user publish change events,
+// and this page swaps in just the rows they name. Each tab tags its own requests
+// so it can skip the events it caused itself.
+(function () {
+    var clientId = Math.random().toString(36).slice(2);
+
+    document.addEventListener("htmx:configRequest", function (event) {
+        event.detail.headers["X-Client-Id"] = clientId;
+    });
+
+    if (!window.EventSource) {
+        return;
+    }
+
+    function find(dataId) {
+        return document.querySelector('[data-id="' + dataId + '"]');
+    }
+
+    function shownListId() {
+        var panel = document.getElementById("reminders-items");
+        return panel ? Number(panel.getAttribute("data-list-id")) : null;
+    }
+
+    function reload(path, selector) {
+        var target = document.querySelector(selector);
+        if (target) {
+            htmx.ajax("GET", path, { target: target, swap: "outerHTML" });
+        }
+    }
+
+    function refreshCounts(listId) {
+        htmx.ajax("GET", "/reminders/counts/" + listId, { target: document.body, swap: "none" });
+    }
+
+    var handlers = {
+        item: function (change) {
+            var rows = change.item_ids.map(function (itemId) {
+                return find("reminder-item-row-" + itemId);
+            });
+            if (change.list_id === shownListId() && rows.indexOf(null) !== -1) {
+                reload("/reminders/items-panel", "#reminders-items");
+                return;
+            }
+            rows.forEach(function (row, index) {
+                if (row) {
+                    htmx.ajax("GET", "/reminders/item-row/" + change.item_ids[index], { target: row, swap: "outerHTML" });
+                }
+            });
+            refreshCounts(change.list_id);
+        },
+        "item-deleted": function (change) {
+            change.item_ids.forEach(function (itemId) {
+                var row = find("reminder-item-row-" + itemId);
+                if (row) {
+                    row.remove();
+                }
+            });
+            refreshCounts(change.list_id);
+        },
+        items: function (change) {
+            if (change.list_id === shownListId()) {
+                reload("/reminders/items-panel", "#reminders-items");
+            } else {
+                refreshCounts(change.list_id);
+            }
+        },
+        list: function (change) {
+            var row = find("reminder-row-" + change.list_id);
+            if (row) {
+                htmx.ajax("GET", "/reminders/list-row/" + change.list_id, { target: row, swap: "outerHTML" });
+            }
+            if (change.list_id === shownListId()) {
+                reload("/reminders/items-panel", "#reminders-items");
+            }
+        },
+        lists: function () {
+            reload("/reminders/content", ".reminders-content");
+        },
+        reload: function () {
+            reload("/reminders/content", ".reminders-content");
+        },
+    };
+
+    var source = new EventSource("/reminders/events");
+    source.onmessage = function (message) {
+        var change = JSON.parse(message.data);
+        var handler = handlers[change.kind];
+        if (handler && change.origin !== clientId) {
+            handler(change);
+        }
+    };
+})();
+
+// Manual order: item rows can be dragged within their group (open or completed).
+// The row moves on the page while it is dragged, and once it is dropped the server
+// is told which row it now follows, so only the moved item is written.
+(function () {
+    var ROW_PREFIX = "reminder-item-row-";
+    var dragged = null;
+    var startedAfter = null;
+
+    function rowOf(element) {
+        return element && element.closest ? element.closest('[data-id^="' + ROW_PREFIX + '"]') : null;
+    }
+
+    function itemId(row) {
+        return row.getAttribute("data-id").slice(ROW_PREFIX.length);
+    }
+
+    function isCompleted(row) {
+        return row.classList.contains("completed");
+    }
+
+    function previousInGroup(row) {
+        var previous = row.previousElementSibling;
+        while (previous && !rowOf(previous)) {
+            previous = previous.previousElementSibling;
+        }
+        return previous && isCompleted(previous) === isCompleted(row) ? previous : null;
+    }
+
+    document.addEventListener("dragstart", function (event) {
+        var row = rowOf(event.target);
+        if (!row) {
+            return;
+        }
+        dragged = row;
+        startedAfter = previousInGroup(row);
+        event.dataTransfer.effectAllowed = "move";
+        event.dataTransfer.setData("text/plain", itemId(row));
+        row.classList.add("opacity-50");
+    });
+
+    document.addEventListener("dragover", function (event) {
+        var row = dragged && rowOf(event.target);
+        if (!row || row.parentNode !== dragged.parentNode || isCompleted(row) !== isCompleted(dragged)) {
+            return;
+        }
+        event.preventDefault();
+        if (row !== dragged) {
+            var box = row.getBoundingClientRect();
+            var below = event.clientY > box.top + box.height / 2;
+            row.parentNode.insertBefore(dragged, below ? row.nextSibling : row);
+        }
+    });
+
+    document.addEventListener("drop", function (event) {
+        if (dragged) {
+            event.preventDefault();
+        }
+    });
+
+    document.addEventListener("dragend", function () {
+        if (!dragged) {
+            return;
+        }
+        var row = dragged;
+        dragged = null;
+        row.classList.remove("opacity-50");
+
+        var after = previousInGroup(row);
+        if (after === startedAfter) {
+            return;
+        }
+        var values = after ? { after_id: itemId(after) } : {};
+        var path = "/reminders/item-row-move/" + itemId(row);
+        htmx.ajax("PATCH", path, { target: document.body, values: values, swap: "none" });
+    });
+})();
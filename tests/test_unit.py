@@ -6,7 +6,41 @@ This module contains unit tests for the Bulldoggy app.
 # Imports
 # --------------------------------------------------------------------------------
 
+import asyncio
+import json
+import jwt
+import multiprocessing
+import os
+import pytest
+import shutil
+import time
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from starlette.datastructures import MutableHeaders
+from tinydb.storages import JSONStorage
+
+from app.routers import api, metrics
+from app.routers.reminders import ReminderItemResponse
+from benchmarks import bench_endpoints
+from app.utils import auth, dbtool
 from app.utils.auth import serialize_token, deserialize_token
+from app.utils.backends import (
+    ITEMS_TABLE,
+    LISTS_TABLE,
+    JournalBackend,
+    TinyDBBackend,
+    close_backends,
+    open_backend,
+)
+from app.utils.cache import RenderCache, token_cache
+from app.utils.events import EventBroker, EventRelay
+from app.utils.exceptions import BadRequestException, ForbiddenException
+from app.utils.metrics import InFlightMiddleware
+from app.utils.scheduler import ReminderSink, scheduler
+from app.utils import storage as storage_module
+from app.utils.storage import AsyncReminderStorage, ReminderStorage
+from app.utils.timing import ServerTimingMiddleware, route_timings, timed
 from testlib.inputs import User
 
 
@@ -23,3 +57,681 @@ def test_token_serialization(user: User):
     username = deserialize_token(token)
     assert username == user.username
     assert token != user.username
+
+
+def test_auth_cookie_verifies_each_token_once(user: User, monkeypatch):
+    token = serialize_token(user.username)
+    calls = []
+    decode_token = auth.decode_token
+    monkeypatch.setattr(auth, "decode_token", lambda token: calls.append(token) or decode_token(token))
+    token_cache.clear()
+
+    cookie = auth.get_auth_cookie(token)
+    assert cookie.username == user.username
+    assert auth.get_auth_cookie(token) is cookie
+    assert len(calls) == 1
+
+    auth.revoke_token(cookie)
+    assert auth.get_auth_cookie(token) is None
+    assert deserialize_token(token) is None
+    token_cache.clear()
+
+
+def test_session_tokens_expire_and_survive_key_rotation(user: User, monkeypatch):
+    monkeypatch.setattr(auth, "key_ring", auth.KeyRing(["first-key"]))
+    token = serialize_token(user.username)
+    cookie = auth.get_auth_cookie(token)
+    assert not cookie.needs_refresh(time.time())
+    assert cookie.needs_refresh(cookie.expires_at - 1)
+
+    auth.rotate_secret_key("second-key")
+    assert auth.get_auth_cookie(token).needs_refresh(time.time())
+    assert deserialize_token(serialize_token(user.username)) == user.username
+
+    # Reissuing a token revokes the one it replaces once the grace period is over
+    monkeypatch.setattr(auth, "revocations", auth.RevocationIndex())
+    monkeypatch.setattr(auth, "REFRESH_GRACE", 0)
+    scope = {"headers": [(b"cookie", f"{auth.auth_cookie_name}={token}".encode())]}
+    refreshed = auth._refresh_token(scope, MutableHeaders())
+    assert auth.get_auth_cookie(token) is None
+    assert deserialize_token(refreshed) == user.username
+
+    auth.retire_secret_key("first-key")
+    assert auth.get_auth_cookie(token) is None
+
+    expired = jwt.encode(
+        {"username": user.username, "iat": 0, "exp": 1, "jti": "old"},
+        "second-key",
+        headers={"kid": auth.KeyRing.key_id("second-key")},
+    )
+    assert deserialize_token(expired) is None
+
+    auth.revoke_user_sessions(user.username)
+    assert deserialize_token(refreshed) is None
+    token_cache.clear()
+
+
+def test_storage_shares_one_backend_per_path(tmp_path):
+    db_path = str(tmp_path / "reminder_db.json")
+    first = ReminderStorage(owner="first", db_path=db_path)
+    second = ReminderStorage(owner="second", db_path=db_path)
+    assert first._backend is second._backend
+
+    list_id = first.create_list("Groceries")
+    assert [reminder_list.id for reminder_list in first.get_lists()] == [list_id]
+    assert second.get_lists() == []
+
+    close_backends()
+    reopened = ReminderStorage(owner="first", db_path=db_path)
+    assert reopened._backend is not first._backend
+    assert [reminder_list.name for reminder_list in reopened.get_lists()] == ["Groceries"]
+
+
+@pytest.mark.parametrize("backend", ["tinydb", "sqlite", "journal"])
+def test_storage_indexes_follow_writes(tmp_path, backend):
+    db_path = str(tmp_path / "reminder_db")
+    storage = ReminderStorage(owner="owner", db_path=db_path, backend=backend)
+    other = ReminderStorage(owner="other", db_path=db_path, backend=backend)
+
+    list_id = storage.create_list("Chores")
+    other_list_id = other.create_list("Errands")
+    first_id = storage.add_item(list_id, "dishes")
+    second_id = storage.add_item(list_id, "laundry")
+    other.add_item(other_list_id, "post office")
+    storage.strike_item(first_id)
+    storage.delete_item(second_id)
+    storage.set_selected_list(list_id)
+
+    backend_ = storage._backend
+    assert backend_.find_ids(LISTS_TABLE, "owner", "owner") == [list_id]
+    assert backend_.find_ids(ITEMS_TABLE, "list_id", list_id) == [first_id]
+    assert storage.get_selected_list().items[0].completed
+
+    storage.delete_list(list_id)
+    storage.reset_selected_after_delete(list_id)
+    assert backend_.find_ids(LISTS_TABLE, "owner", "owner") == []
+    assert backend_.find_ids(ITEMS_TABLE, "list_id", list_id) == []
+    assert storage.get_selected_list() is None
+    assert len(other.get_items(other_list_id)) == 1
+    close_backends()
+
+
+def test_sqlite_backend_rolls_back_failed_transactions(tmp_path):
+    storage = ReminderStorage(owner="owner", db_path=str(tmp_path / "reminder.db"), backend="sqlite")
+    list_id = storage.create_list("Chores")
+
+    with pytest.raises(RuntimeError):
+        with storage._backend.transaction():
+            storage.add_item(list_id, "dishes")
+            raise RuntimeError()
+
+    assert storage.get_items(list_id) == []
+    close_backends()
+
+
+def test_dbtool_round_trips_tinydb_through_sqlite(tmp_path, monkeypatch):
+    monkeypatch.setattr(dbtool, "READ_CHUNK_SIZE", 7)
+    source_path = str(tmp_path / "reminder_db.json")
+    storage = ReminderStorage(owner="owner", db_path=source_path)
+    for list_number in range(3):
+        list_id = storage.create_list(f"List {list_number}")
+        for item_number in range(7):
+            storage.add_item(list_id, f'Item {item_number} "quoted" {{braces}}')
+    storage.delete_item(2)
+    storage.strike_item(3)
+    storage.set_selected_list(list_id)
+    close_backends()
+
+    sqlite_spec, export_spec = f"sqlite:{tmp_path / 'reminder.db'}", f"tinydb:{tmp_path / 'export.json'}"
+    assert dbtool.main(["copy", f"tinydb:{source_path}", sqlite_spec, "--batch-size", "4"]) == 0
+    assert dbtool.main(["copy", sqlite_spec, export_spec, "--batch-size", "4"]) == 0
+    assert dbtool.main(["verify", f"tinydb:{source_path}", export_spec]) == 0
+    assert dbtool.main(["copy", f"tinydb:{source_path}", sqlite_spec]) == 1
+
+    with open(source_path) as source, open(tmp_path / "export.json") as export:
+        assert json.load(source) == json.load(export)
+
+
+def test_async_storage_reads_stay_fast_while_writes_run(tmp_path, monkeypatch):
+    # Simulate a slow disk: every rewrite of the JSON file takes 50ms
+    write_delay = 0.05
+    json_write = JSONStorage.write
+
+    def slow_write(self, data):
+        time.sleep(write_delay)
+        json_write(self, data)
+
+    monkeypatch.setattr(JSONStorage, "write", slow_write)
+    storage = AsyncReminderStorage(ReminderStorage(owner="owner", db_path=str(tmp_path / "reminder_db.json")))
+
+    async def run():
+        list_id = await storage.create_list("Chores")
+        writes = [asyncio.create_task(storage.add_item(list_id, f"Item {number}")) for number in range(10)]
+        reads = 0
+        while not all(write.done() for write in writes):
+            await storage.get_lists()
+            reads += 1
+        await asyncio.gather(*writes)
+        return list_id, reads
+
+    # Reads queued behind the writes would finish about one per write; unblocked ones keep going meanwhile
+    list_id, reads = asyncio.run(run())
+    assert reads > 5 * 10
+    assert len(storage.storage.get_items(list_id)) == 10
+    close_backends()
+
+
+def test_tinydb_write_behind_coalesces_rewrites(tmp_path, monkeypatch):
+    rewrites = []
+    json_write = JSONStorage.write
+
+    def counting_write(self, data):
+        rewrites.append(data)
+        json_write(self, data)
+
+    monkeypatch.setattr(JSONStorage, "write", counting_write)
+    db_path = str(tmp_path / "reminder_db.json")
+    storage = ReminderStorage(owner="owner", db_path=db_path, flush_interval=60)
+
+    list_id = storage.create_list("Chores")
+    for number in range(20):
+        storage.add_item(list_id, f"Item {number}")
+    assert rewrites == []
+
+    close_backends()
+    assert len(rewrites) == 1
+    with open(db_path) as db_file:
+        assert len(json.load(db_file)["reminder_items"]) == 20
+
+    # Options of one backend are rejected by the others instead of failing inside them
+    with pytest.raises(ValueError, match="flush_interval"):
+        open_backend(str(tmp_path / "reminders.db"), "sqlite", flush_interval=60)
+
+
+def test_page_data_matches_single_row_queries(tmp_path):
+    storage = ReminderStorage(owner="owner", db_path=str(tmp_path / "reminder_db.json"))
+    storage.create_list("Errands")
+    list_id = storage.create_list("Chores")
+    for description in ["dishes", "laundry", "vacuum"]:
+        storage.add_item(list_id, description)
+    storage.strike_item(storage.get_items(list_id)[0].id)
+
+    assert storage.get_page_data().selected_list is None
+    storage.set_selected_list(list_id)
+
+    page_data = storage.get_page_data()
+    assert page_data.lists == storage.get_lists()
+    assert page_data.selected_list == storage.get_selected_list()
+    assert (page_data.working_count, page_data.done_count) == (2, 1)
+    assert storage.get_item_counts(list_id) == (2, 1)
+    assert storage.get_selected_list_id() == list_id
+
+    storage.delete_list(list_id)
+    assert storage.get_page_data().selected_list is None
+    close_backends()
+
+
+def test_writes_bump_the_owner_data_version(tmp_path):
+    storage = ReminderStorage(owner="owner", db_path=str(tmp_path / "reminder_db.json"))
+    other = ReminderStorage(owner="other", db_path=str(tmp_path / "reminder_db.json"))
+    version, other_version = storage.data_version(), other.data_version()
+
+    list_id = storage.create_list("Chores")
+    assert storage.data_version() != version
+    version = storage.data_version()
+    storage.get_page_data()
+    assert storage.data_version() == version
+
+    storage.add_item(list_id, "dishes")
+    assert storage.data_version() != version
+    assert other.data_version() == other_version
+    close_backends()
+
+
+def test_render_cache_evicts_by_entries_and_bytes():
+    cache = RenderCache(max_entries=2, max_bytes=10)
+    cache.put("first", "page", "v1", b"1234")
+    assert cache.get("first", "page", "v1") == b"1234"
+    assert cache.get("first", "page", "v2") is None
+
+    cache.put("second", "page", "v1", b"1234")
+    cache.get("first", "page", "v1")
+    cache.put("third", "page", "v1", b"12")
+    assert cache.get("second", "page", "v1") is None
+    assert len(cache) == 2
+
+    cache.put("fourth", "page", "v1", b"12345678")
+    assert cache.get("first", "page", "v1") is None
+    assert cache.size <= 10
+
+
+def test_storage_rows_serialize_at_the_api_boundary(tmp_path):
+    storage = ReminderStorage(owner="user", db_path=str(tmp_path / "reminder_db.json"))
+    list_id = storage.create_list("Chores")
+    item = storage.get_item(storage.add_item(list_id, "dishes"))
+    assert not hasattr(item, "__dict__")
+    assert item == storage.get_items(list_id)[0]
+
+    response = ReminderItemResponse.model_validate({"reminder_item": item})
+    assert response.reminder_item.model_dump() == item.as_dict()
+    close_backends()
+
+
+def test_bulk_item_methods_write_once(tmp_path, monkeypatch):
+    storage = ReminderStorage(owner="user", db_path=str(tmp_path / "reminder_db.json"))
+    list_id = storage.create_list("Groceries")
+
+    saves = []
+    monkeypatch.setattr(JSONStorage, "write", lambda self, data: saves.append(data))
+    item_ids = storage.add_items(list_id, [f"item {n}" for n in range(200)])
+    assert len(item_ids) == 200 and len(saves) == 1
+
+    assert storage.set_items_completed(list_id, True) == 200
+    storage.strike_item(item_ids[0])
+    assert storage.clear_completed_items(list_id) == 199
+    assert [item.id for item in storage.get_items(list_id)] == [item_ids[0]]
+    assert len(saves) == 4
+
+    other = ReminderStorage(owner="other", db_path=str(tmp_path / "reminder_db.json"))
+    with pytest.raises(ForbiddenException):
+        other.delete_items([item_ids[0]])
+    storage.delete_items([item_ids[0]])
+    assert storage.get_item_counts(list_id) == (0, 0)
+    close_backends()
+
+
+@pytest.mark.parametrize("backend", ["tinydb", "sqlite", "journal"])
+def test_bulk_delete_counts_repeated_ids_once(tmp_path, backend):
+    storage = ReminderStorage(owner="user", db_path=str(tmp_path / "reminders.db"), backend=backend)
+    list_id = storage.create_list("Chores")
+    item_ids = storage.add_items(list_id, ["a", "b", "c"])
+    storage.strike_item(item_ids[0])
+    storage.strike_item(item_ids[1])
+
+    storage.delete_items([item_ids[0], item_ids[0]])
+    reminder_list = storage.get_list(list_id)
+    assert {item.id for item in storage.get_items(list_id)} == set(item_ids[1:])
+    assert (reminder_list.item_count, reminder_list.done_count) == (2, 1)
+    close_backends()
+
+
+@pytest.mark.parametrize("backend", ["tinydb", "sqlite", "journal"])
+def test_lists_with_items_page_and_replace(tmp_path, backend):
+    storage = ReminderStorage(owner="user", db_path=str(tmp_path / "reminders.db"), backend=backend)
+    list_ids = [storage.create_list_with_items(f"List {n}", [{"description": f"item {n}"}]) for n in range(3)]
+
+    page = storage.get_lists_with_items(after_id=list_ids[0], limit=1)
+    assert [reminder_list.id for reminder_list in page] == [list_ids[1]]
+    assert [item.description for item in page[0].items] == ["item 1"]
+    assert storage.get_lists_with_items(with_items=False)[0].items is None
+
+    storage.replace_list(list_ids[0], "Renamed", [{"description": "new", "completed": True}])
+    replaced = storage.get_list_with_items(list_ids[0])
+    assert replaced.name == "Renamed"
+    assert [(item.description, item.completed) for item in replaced.items] == [("new", True)]
+    close_backends()
+
+
+def test_item_pages_follow_a_stable_cursor(tmp_path):
+    storage = ReminderStorage(owner="user", db_path=str(tmp_path / "reminder_db.json"))
+    list_id = storage.create_list("Long")
+    item_ids = storage.add_items(list_id, [f"item {n}" for n in range(7)])
+    storage.strike_item(item_ids[1])
+
+    pages, cursor = [], None
+    while True:
+        page = storage.get_items_page(list_id, cursor, limit=3)
+        pages.append([item.id for item in page.items])
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+
+    assert sum(pages, []) == [item_ids[0], *item_ids[2:], item_ids[1]]
+    assert [len(page) for page in pages] == [3, 3, 1]
+
+    storage.set_selected_list(list_id)
+    page_data = storage.get_page_data(items_limit=3)
+    assert page_data.selected_list.next_cursor == storage.get_items_page(list_id, limit=3).next_cursor
+    assert page_data.working_count + page_data.done_count == 7
+    close_backends()
+
+
+@pytest.mark.parametrize("backend", ["tinydb", "sqlite", "journal"])
+def test_list_counters_follow_item_writes(tmp_path, backend):
+    db_path = str(tmp_path / "reminders.db")
+    storage = ReminderStorage(owner="user", db_path=db_path, backend=backend)
+    list_id = storage.create_list("Chores")
+    item_ids = storage.add_items(list_id, ["a", "b", "c"])
+    storage.add_item(list_id, "d")
+    storage.strike_item(item_ids[0])
+    storage.delete_item(item_ids[1])
+    storage.set_items_completed(list_id, True)
+    storage.clear_completed_items(list_id)
+    storage.add_item(list_id, "e")
+    storage.strike_item(storage.get_items(list_id)[0].id)
+    assert storage.get_item_counts(list_id) == (0, 1)
+
+    # Drifted counters are repaired by the recount command
+    storage._backend.update(LISTS_TABLE, {"item_count": 9, "done_count": None}, [list_id])
+    close_backends()
+    assert dbtool.main(["recount", f"{backend}:{db_path}"]) == 0
+    list_row = ReminderStorage(owner="user", db_path=db_path, backend=backend).get_lists()[0]
+    assert (list_row.item_count, list_row.done_count) == (1, 1)
+    close_backends()
+
+
+def test_event_streams_share_one_history_per_owner():
+    async def scenario():
+        broker = EventBroker(history=2, keepalive=60)
+        broker.start()
+        first, second = broker.stream("user"), broker.stream("user")
+        reads = [asyncio.ensure_future(anext(stream)) for stream in (first, second)]
+        await asyncio.sleep(0)
+
+        # Storage threads publish; both streams get the same formatted message
+        await asyncio.to_thread(broker.publish, "user", "item", list_id=1, item_ids=[2])
+        first_message, second_message = await asyncio.wait_for(asyncio.gather(*reads), 1)
+        assert first_message == second_message
+        data = json.loads(first_message.split("data: ")[1])
+        assert data == {"kind": "item", "list_id": 1, "item_ids": [2], "origin": None}
+
+        # A reconnect after its events fell out of the history has to reload
+        last_event_id = first_message.split("\n")[0].removeprefix("id: ")
+        for item_id in range(3):
+            broker._append("user", "item", {"list_id": 1, "item_ids": [item_id]})
+        resumed = broker.stream("user", last_event_id)
+        assert json.loads((await anext(resumed)).split("data: ")[1])["kind"] == "reload"
+
+        for stream in (first, second, resumed):
+            await stream.aclose()
+        assert not broker._channels
+        await broker.stop()
+
+    asyncio.run(scenario())
+
+
+def _insert_lists(db_path: str, name: str, count: int) -> None:
+    storage_backend = TinyDBBackend(db_path)
+    for number in range(count):
+        storage_backend.insert(LISTS_TABLE, {"owner": "owner", "name": f"{name} {number}"})
+    storage_backend.close()
+
+
+def test_tinydb_worker_processes_share_one_file(tmp_path):
+    db_path = str(tmp_path / "reminder_db.json")
+    observer = TinyDBBackend(db_path)
+    version = observer.data_version("owner")
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_insert_lists, args=(db_path, f"worker {n}", 20)) for n in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    # No write is lost, and the other processes' writes invalidate the data versions
+    assert observer.data_version("owner") != version
+    list_ids = {row["id"] for row in observer.find(LISTS_TABLE, "owner", "owner")}
+    assert len(list_ids) == 60
+
+    # The observer's own writes neither reuse IDs nor look like someone else's
+    version = observer.data_version("owner")
+    assert observer.insert(LISTS_TABLE, {"owner": "owner", "name": "mine"}) not in list_ids
+    assert observer.data_version("owner") == version
+    observer.close()
+
+
+def test_event_relay_delivers_other_processes_events(tmp_path):
+    path = str(tmp_path / "reminder_db.json.events")
+    first, second = EventRelay(path, max_bytes=300), EventRelay(path, max_bytes=300)
+
+    first.write("user", "item", {"list_id": 1, "item_ids": [2], "origin": None})
+    assert second.read() == ([("user", "item", {"list_id": 1, "item_ids": [2], "origin": None})], False)
+    assert first.read() == ([], False)
+
+    # A process keeps the unread lines of others when it truncates the file itself
+    second.write("user", "list", {"list_id": 1, "origin": None})
+    for _ in range(3):
+        first.write("user", "lists", {"origin": None})
+    assert first.read() == ([("user", "list", {"list_id": 1, "origin": None})], False)
+
+    # Truncation by another process tells readers that they may have missed events
+    events, missed = second.read()
+    assert missed
+    first.close()
+    second.close()
+
+
+def test_journal_backend_replays_and_compacts(tmp_path):
+    db_path = str(tmp_path / "reminder_db.json")
+    storage_backend = JournalBackend(db_path, compact_bytes=10**9)
+    list_id = storage_backend.insert(LISTS_TABLE, {"owner": "owner", "name": "Chores"})
+    item_ids = storage_backend.insert_many(ITEMS_TABLE, [{"list_id": list_id, "description": "dishes"}] * 3)
+    with storage_backend.transaction():
+        storage_backend.update(ITEMS_TABLE, {"completed": True}, item_ids[:2])
+        storage_backend.remove(ITEMS_TABLE, item_ids[2:])
+
+    # Each transaction is one line. Copying the files while the backend is open leaves
+    # the state of a crash, where a line cut short by the crash is dropped on replay.
+    crashed_path = str(tmp_path / "crashed.json")
+    shutil.copy(f"{db_path}.journal", f"{crashed_path}.journal")
+    with open(f"{crashed_path}.journal", "ab") as journal_file:
+        journal_file.write(b'{"seq":4,"ops":[["remove","reminder_lists"')
+    with open(f"{db_path}.journal", "rb") as journal_file:
+        assert len(journal_file.readlines()) == 3
+    storage_backend.close()
+
+    reopened = JournalBackend(crashed_path)
+    assert reopened.get(LISTS_TABLE, list_id)["name"] == "Chores"
+    assert [row["completed"] for row in reopened.find(ITEMS_TABLE, "list_id", list_id)] == [True, True]
+    assert reopened.insert(ITEMS_TABLE, {"list_id": list_id, "description": "laundry"}) == item_ids[2] + 1
+
+    # Compacting leaves a snapshot that TinyDB can read and an empty journal
+    reopened.compact()
+    assert os.path.getsize(f"{crashed_path}.journal") == 0
+    reopened.close()
+    tinydb_backend = TinyDBBackend(crashed_path)
+    assert len(tinydb_backend.find(ITEMS_TABLE, "list_id", list_id)) == 3
+    tinydb_backend.close()
+
+
+def test_endpoint_benchmark_reports_every_scenario(tmp_path):
+    output = tmp_path / "bench.json"
+    argv = ["--items", "40", "--lists", "4", "--requests", "10", "--warmup", "2", "--output", str(output)]
+    assert bench_endpoints.main(argv) == 0
+
+    results = json.loads(output.read_text())
+    assert set(results["scenarios"]) == {scenario.name for scenario in bench_endpoints.SCENARIOS}
+    for scenario in results["scenarios"].values():
+        assert scenario["requests"] == 10 and not scenario["errors"]
+    assert bench_endpoints.compare(results, results, tolerance=0) == []
+
+
+def test_server_timing_reports_stages_per_route():
+    timed_app = FastAPI()
+    timed_app.add_middleware(ServerTimingMiddleware)
+
+    @timed_app.get("/items/{item_id}")
+    async def get_item(item_id: int) -> dict:
+        with timed("read"):
+            time.sleep(0.002)
+        return {"id": item_id}
+
+    async def scenario():
+        async with AsyncClient(transport=ASGITransport(app=timed_app), base_url="http://test") as client:
+            return [await client.get(f"/items/{item_id}") for item_id in range(3)]
+
+    route_timings.clear()
+    responses = asyncio.run(scenario())
+    header = responses[0].headers["server-timing"]
+    parts = [part.split(";dur=") for part in header.split(", ")]
+    durations = {stage: float(duration) for stage, duration in parts}
+    assert set(durations) == {"read", "total"}
+    assert 2 <= durations["read"] <= durations["total"]
+
+    # Requests are aggregated by route template, not by their concrete paths
+    histogram = route_timings.snapshot()[("GET", "/items/{item_id}", "read")]
+    assert histogram.count == 3 and histogram.cumulative_counts()[-1] == 3
+    route_timings.clear()
+
+
+def test_metrics_endpoint_reports_storage_and_database_files(tmp_path):
+    metrics_app = FastAPI()
+    metrics_app.include_router(metrics.router)
+    metrics_app.add_middleware(InFlightMiddleware)
+
+    async def scrape() -> dict[str, float]:
+        async with AsyncClient(transport=ASGITransport(app=metrics_app), base_url="http://test") as client:
+            response = await client.get("/metrics")
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        samples = [line.rsplit(" ", 1) for line in response.text.splitlines() if not line.startswith("#")]
+        return {name: float(value) for name, value in samples}
+
+    db_path = str(tmp_path / "reminder_db.json")
+    storage = ReminderStorage(owner="owner", db_path=db_path)
+    count = 'reminders_storage_call_seconds_count{method="create_list"}'
+    before = asyncio.run(scrape()).get(count, 0)
+    storage.create_list("first")
+    storage.create_list("second")
+
+    samples = asyncio.run(scrape())
+    assert samples[count] == before + 2
+    assert samples['reminders_storage_call_seconds_bucket{method="create_list",le="+Inf"}'] == samples[count]
+    labels = f'{{backend="tinydb",path="{db_path}"}}'
+    assert samples[f"reminders_db_rewrites_total{labels}"] == 2
+    assert samples[f"reminders_db_file_bytes{labels}"] == os.path.getsize(db_path)
+    # The scrape itself is the one request in flight
+    assert samples["reminders_requests_in_flight"] == 1
+
+
+def test_scheduler_fires_each_due_reminder_once(tmp_path):
+    db_path = str(tmp_path / "reminder_db.json")
+    storage = ReminderStorage(owner="owner", db_path=db_path)
+    list_id = storage.create_list("Chores")
+    soon, cancelled, done, later = (
+        storage.add_item(list_id, name, due_at=time.time() + delay)
+        for name, delay in [("soon", 0.2), ("cancelled", 0.2), ("done", 0.2), ("later", 3600)]
+    )
+    storage.set_item_due(cancelled, None)
+    storage.strike_item(done)
+
+    class ListSink(ReminderSink):
+        def __init__(self) -> None:
+            self.delivered = []
+
+        async def deliver(self, owner: str, item) -> None:
+            self.delivered.append((owner, item.id))
+
+    def storage_for(owner: str) -> AsyncReminderStorage:
+        return AsyncReminderStorage(ReminderStorage(owner=owner, db_path=db_path))
+
+    async def scenario() -> list:
+        sink = ListSink()
+        await scheduler.start(storage._backend, storage_for, sink)
+        try:
+            # Loaded from the due table, which only holds the pending reminders
+            assert len(scheduler) == 2
+            # Moving a reminder earlier wakes the scheduler up
+            storage.set_item_due(later, time.time() + 0.1)
+            await asyncio.sleep(0.5)
+            assert len(scheduler) == 0
+        finally:
+            await scheduler.stop()
+        return sink.delivered
+
+    assert sorted(asyncio.run(scenario())) == [("owner", soon), ("owner", later)]
+    assert storage.claim_due_items([soon, later]) == []
+    assert storage.get_item(cancelled).due_at is None
+    close_backends()
+
+
+def test_recurring_items_advance_instead_of_adding_rows(tmp_path):
+    storage = ReminderStorage(owner="owner", db_path=str(tmp_path / "reminder_db.json"))
+    list_id = storage.create_list("Habits")
+    start = time.time() - 10 * 86400 + 60
+    item_id = storage.add_item(list_id, "stretch", due_at=start)
+    storage.set_item_due(item_id, start, "daily")
+
+    # Completing skips the missed occurrences and keeps the item open
+    storage.strike_item(item_id)
+    item = storage.get_item(item_id)
+    assert not item.completed and item.recurrence == "daily"
+    assert 0 < item.due_at - time.time() <= 86400
+    assert storage.get_item_counts(list_id) == (1, 0)
+
+    occurrences = storage.get_occurrences(item_id, 1000)
+    assert len(occurrences) == 1000 and occurrences[0] == item.due_at
+    assert all(later - earlier <= 86400 + 3600 for earlier, later in zip(occurrences, occurrences[1:]))
+
+    assert storage.set_items_completed(list_id, True) == 1
+    assert storage.get_item(item_id).due_at == occurrences[1]
+    assert len(storage.get_items(list_id)) == 1
+
+    with pytest.raises(BadRequestException):
+        storage.set_item_due(item_id, start, "every 2 fortnights")
+    close_backends()
+
+
+def test_api_rejects_due_times_without_a_timezone(tmp_path):
+    storage = ReminderStorage(owner="owner", db_path=str(tmp_path / "reminder_db.json"))
+    item_id = storage.add_item(storage.create_list("Chores"), "dishes")
+    api_app = FastAPI()
+    api_app.include_router(api.router)
+    api_app.dependency_overrides[auth.get_storage_for_api] = lambda: AsyncReminderStorage(storage)
+
+    async def put_due(due_at: str):
+        async with AsyncClient(transport=ASGITransport(app=api_app), base_url="http://test") as client:
+            return await client.put(f"/api/items/{item_id}/due", json={"due_at": due_at})
+
+    assert asyncio.run(put_due("2026-01-01T09:00")).status_code == 422
+    assert storage.get_item(item_id).due_at is None
+
+    response = asyncio.run(put_due("2026-01-01T09:00:00+01:00"))
+    assert response.status_code == 200
+    assert storage.get_item(item_id).due_at == 1767254400
+    close_backends()
+
+
+@pytest.mark.parametrize("backend", ["tinydb", "sqlite"])
+def test_moving_an_item_writes_only_its_row(tmp_path, backend, monkeypatch):
+    storage = ReminderStorage(owner="owner", db_path=str(tmp_path / "reminders.db"), backend=backend)
+    list_id = storage.create_list("Chores")
+    item_ids = storage.add_items(list_id, ["a", "b", "c", "d"])
+
+    def order(*indexes):
+        return [item_ids[index] for index in indexes]
+
+    writes = []
+    update = storage._backend.update
+
+    def counting_update(table, fields, ids):
+        writes.append((table, list(ids)))
+        update(table, fields, ids)
+
+    monkeypatch.setattr(storage._backend, "update", counting_update)
+    storage.move_item(item_ids[3], after_id=item_ids[0])
+    storage.move_item(item_ids[2])
+    assert writes == [(ITEMS_TABLE, [item_ids[3]]), (ITEMS_TABLE, [item_ids[2]])]
+    assert [item.id for item in storage.get_items(list_id)] == order(2, 0, 3, 1)
+    assert [item.id for item in storage.get_list_with_items(list_id).items] == order(2, 0, 3, 1)
+
+    # Moves into the same ever smaller gap grow the keys until a background rebalance shortens them
+    async def move_back_and_forth():
+        async_storage = AsyncReminderStorage(storage)
+        for _ in range(50):
+            await async_storage.move_item(item_ids[3], after_id=item_ids[0])
+            await async_storage.move_item(item_ids[1], after_id=item_ids[0])
+        await asyncio.gather(*storage_module._background_writes)
+
+    asyncio.run(move_back_and_forth())
+    assert max(len(row["position"]) for row in storage._backend.find(ITEMS_TABLE, "list_id", list_id)) <= 16
+    assert [item.id for item in storage.get_items(list_id)] == order(2, 0, 1, 3)
+
+    # New items go to the end, and items without positions are numbered on their first move
+    new_id = storage.add_item(list_id, "e")
+    legacy_row = {"list_id": list_id, "description": "old", "completed": False}
+    legacy_id = storage._backend.insert(ITEMS_TABLE, legacy_row)
+    storage.move_item(new_id, after_id=legacy_id)
+    assert [item.id for item in storage.get_items(list_id)] == [legacy_id, new_id, *order(2, 0, 1, 3)]
+    close_backends()